@@ -1,10 +1,22 @@
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from routers import user, myTrip, tripPlan, crew, joinRequest, chat
+from routers import user, myTrip, tripPlan, crew, joinRequest, chat, metrics, jobs
+from utils.llmClient import close_clients
+from utils.jobQueue import job_queue
+from utils.GetWeather import close_weather_client
+from utils.admission import ProviderBusy
+from utils.resilience import CircuitOpen
+from utils.tracing import start_request_trace, server_timing_header
+from utils.function import run_save_plans_job
 
 app = FastAPI()
 
+# 백그라운드 작업 종류별 처리 함수 (작업 큐가 시작되기 전에 모두 등록)
+job_queue.register("trip_content", myTrip.fill_trip_content)
+job_queue.register("save_plans", run_save_plans_job)
+
 origins = ["*"]
 
 app.add_middleware(
@@ -13,8 +25,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    # 요청 안에서 일어난 외부 호출을 모아 Server-Timing 헤더로 내려준다 (스트리밍 응답은 헤더 전송 시점까지만 포함)
+    path_segment = request.url.path.strip("/").split("/")[0]
+    spans = start_request_trace(f"/{path_segment}")
+    response = await call_next(request)
+    header = server_timing_header(spans)
+    if header:
+        response.headers["Server-Timing"] = header
+    return response
+
+@app.exception_handler(ProviderBusy)
+async def provider_busy_handler(request: Request, exc: ProviderBusy):
+    # 외부 API 대기열이 가득 찼을 때: 일반 오류(400) 대신 재시도 시점을 알려준다
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={"result_code": 429, "response": f"Server is busy ({exc.provider}), retry after {exc.retry_after}s", "retry_after": exc.retry_after}
+    )
+
+@app.exception_handler(CircuitOpen)
+async def circuit_open_handler(request: Request, exc: CircuitOpen):
+    # 외부 API 장애로 서킷이 열려 있을 때: 바로 실패시키고 다시 시도할 시점을 알려준다
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={"result_code": 503, "response": f"{exc.provider} is temporarily unavailable, retry after {exc.retry_after}s", "retry_after": exc.retry_after}
+    )
+
+@app.on_event("startup")
+async def startup_event():
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await job_queue.stop()
+    await close_clients()
+    await close_weather_client()
+
 @app.get('/')
 async def health_check():
     return "OK"
@@ -24,4 +76,6 @@ app.include_router(myTrip.router, tags=["mytrip"])
 app.include_router(tripPlan.router, tags=["tripPlan"])
 app.include_router(crew.router, tags=["crew"])
 app.include_router(joinRequest.router, tags=["joinRequest"])
-app.include_router(chat.router, tags=["chat"])
\ No newline at end of file
+app.include_router(chat.router, tags=["chat"])
+app.include_router(metrics.router, tags=["metrics"])
+app.include_router(jobs.router, tags=["jobs"])
\ No newline at end of file
@@ -3,6 +3,7 @@ import json
 from sqlalchemy import *
 from sqlalchemy.orm import sessionmaker
 from pymongo import MongoClient
+from utils.tracing import MongoTraceListener, instrument_engine
 
 # BASE_DIR = os.path.dirname(os.path.relpath("./"))
 # secret_file = os.path.join(BASE_DIR, 'secret.json')
@@ -20,6 +21,10 @@ def get_secret(setting, secrets=secrets):
         error_msg = "Set the {} environment variable".format(setting)
         raise ImproperlyConfigured(error_msg)
 
+# 선택 설정값은 secret.json에 없으면 기본값 사용
+def get_setting(setting, default=None, secrets=secrets):
+    return secrets.get(setting, default)
+
 PORT = get_secret("MYSQL_PORT")
 SQLUSERNAME = get_secret("MYSQL_USER_NAME")
 SQLPASSWORD = get_secret("MYSQL_PASSWORD")
@@ -40,6 +45,7 @@ DB_URL = f'mysql+pymysql://{SQLUSERNAME}:{SQLPASSWORD}@{HOSTNAME}:{PORT}/{SQLDBN
 class db_conn:
     def __init__(self):
         self.engine = create_engine(DB_URL, pool_recycle=500)
+        instrument_engine(self.engine)
 
     def sessionmaker(self):
         Session = sessionmaker(bind=self.engine)
@@ -54,5 +60,5 @@ sqldb = db_conn()
 
 # Mongo 연결 설정
 mongodb_url = f'mongodb://{MongoDB_Username}:{MongoDB_Password}@{MongoDB_Hostname}:27017/'
-client = MongoClient(mongodb_url)
+client = MongoClient(mongodb_url, event_listeners=[MongoTraceListener()])
 db = client['TripPass']
\ No newline at end of file
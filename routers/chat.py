@@ -1,12 +1,19 @@
 from fastapi import FastAPI, APIRouter, Query, HTTPException, Depends, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, ValidationError
 from typing import Optional
+import asyncio
+import re
 from datetime import datetime
 from models.models import *
 import json
 from database import sqldb, db
 from utils.function import *
+from utils.chatMemory import memory_store
+from utils.planEmbedding import invalidate_plan_embeddings
+from utils.admission import ProviderBusy
+from utils.resilience import CircuitOpen
 
 router = APIRouter()
 
@@ -14,6 +21,9 @@ router = APIRouter()
 ChatData_collection = db['ChatData']
 SavePlace_collection = db['SavePlace']
 
+# 스트리밍 응답이 끝난 뒤에도 돌고 있는 작업 (이벤트 루프는 약한 참조만 들고 있어서 직접 보관)
+stream_tasks = set()
+
 class QuestionRequest(BaseModel):
     userId: str
     tripId: str
@@ -33,6 +43,11 @@ def convert_objectid_to_str(doc):
 def formatDate(dateObj):
     return dateObj.strftime("%Y년 %m월 %d일")
 
+BUSY_MESSAGE = "지금 요청이 많아 처리하지 못했어요😥 잠시 후 다시 시도해주세요!"
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
 @router.get(path='/getWelcomeMessage', description="환영 메시지 가져오기")
 async def getWelcomeMessage(
     userId: str = Query(...), 
@@ -48,9 +63,10 @@ async def getWelcomeMessage(
             endDate = formatDate(trip_info.endDate)
             welcome_message = f"안녕하세요,\n {startDate}부터 {endDate}까지 \n{trip_info.city}(으)로 여행을 가시는 {user_info.nickname}님!\n{user_info.nickname}님만의 여행 플랜을 함께 만들어 볼까요?🤓"
 
-            # 환영 메시지를 메모리에 저장
-            from utils.function import memory
-            memory.save_context({"input": ""}, {"output": welcome_message})
+            # 새 대화를 시작하므로 메모리를 비우고 환영 메시지를 저장
+            memory = memory_store.reset(userId, tripId)
+            memory.add_message("assistant", welcome_message)
+            memory_store.save(memory)
 
             # 환영 메시지를 ChatData_collection에 저장
             chat_log = {
@@ -170,6 +186,7 @@ async def updateTripPlan(
                 # 시간 업데이트
                 plan.time = new_time
                 session.commit()
+                invalidate_plan_embeddings([plan.planId])
                 updated = True
                 break
         
@@ -188,21 +205,78 @@ async def updateTripPlan(
 @router.post(path='/callOpenAIFunction', description="OpenAI 함수 호출")
 async def call_openai_function_endpoint(request: QuestionRequest):
     try:
-        response = call_openai_function(request.message, request.userId, request.tripId, request.latitude, request.longitude, request.personality)
+        response = await call_openai_function(request.message, request.userId, request.tripId, request.latitude, request.longitude, request.personality)
         return {"result_code": 200, 
                 "response": response["result"], 
                 "geo": response.get("geo_coordinates"), 
                 "isSerp": response.get("isSerp"),
-                "function_name": response.get("function_name")}
+                "function_name": response.get("function_name"),
+                "tokens_saved": response.get("tokens_saved"),
+                "jobId": response.get("jobId")}
     except ValidationError as e:
         return {"result_code": 422, "response": f"Validation error: {str(e)}"}
+    except (ProviderBusy, CircuitOpen):
+        # 앱 공통 핸들러가 429/503 + Retry-After로 응답
+        raise
     except Exception as e:
         return {"result_code": 400, "response": f"Error: {str(e)}"}
 
-@router.post(path='/clearMemory', description="메모리 초기화")
-async def clear_memory_endpoint():
+@router.post(path='/callOpenAIFunctionStream', description="OpenAI 함수 호출 (SSE 스트리밍, 단계별 이벤트 전송)")
+async def call_openai_function_stream_endpoint(request: QuestionRequest):
+    queue = asyncio.Queue()
+    streamed_tokens = False
+
+    async def emit(event, data):
+        nonlocal streamed_tokens
+        if event == "token":
+            streamed_tokens = True
+        await queue.put((event, data))
+
+    async def run():
+        try:
+            response = await call_openai_function(request.message, request.userId, request.tripId, request.latitude, request.longitude, request.personality, emit=emit)
+            await queue.put(("__result__", response))
+        except (ProviderBusy, CircuitOpen) as e:
+            await queue.put(("__busy__", e))
+        except Exception as e:
+            await queue.put(("__error__", str(e)))
+
+    async def event_stream():
+        # 클라이언트 연결이 끊겨도 메모리/DB 저장이 끝나도록 작업은 취소하지 않는다
+        task = asyncio.create_task(run())
+        stream_tasks.add(task)
+        task.add_done_callback(stream_tasks.discard)
+        yield format_sse("accepted", {"userId": request.userId, "tripId": request.tripId})
+        while True:
+            event, data = await queue.get()
+            if event == "__busy__":
+                result_code = 429 if isinstance(data, ProviderBusy) else 503
+                yield format_sse("error", {"result_code": result_code, "response": BUSY_MESSAGE, "retry_after": data.retry_after})
+                break
+            if event == "__error__":
+                yield format_sse("error", {"result_code": 400, "response": f"Error: {data}"})
+                break
+            if event == "__result__":
+                # 토큰 스트리밍을 하지 않은 단계(장소 검색, 일정 생성 등)는 완성된 텍스트를 단어 단위로 전송
+                if not streamed_tokens and data["result"]:
+                    for token in re.findall(r"\S+\s*|\s+", data["result"]):
+                        yield format_sse("token", {"text": token})
+                yield format_sse("done", {"result_code": 200,
+                                          "response": data["result"],
+                                          "geo": data.get("geo_coordinates"),
+                                          "isSerp": data.get("isSerp"),
+                                          "function_name": data.get("function_name"),
+                                          "tokens_saved": data.get("tokens_saved")})
+                break
+            yield format_sse(event, data)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.post(path='/clearMemory', description="해당 사용자/여행의 대화 메모리 초기화")
+async def clear_memory_endpoint(userId: str, tripId: str):
     try:
-        memory.clear()
+        memory_store.clear(userId, tripId)
         return {"result_code": 200, "response": "Memory has been cleared."}
     except Exception as e:
         return {"result_code": 400, "response": f"Error: {str(e)}"}
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, HTTPException
+from utils.jobQueue import job_queue
+
+router = APIRouter()
+
+@router.get('/jobs/{jobId}', description="백그라운드 작업(배너/메모, 일정 생성) 상태 조회")
+async def get_job_status(jobId: str):
+    job = job_queue.get(jobId)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"result_code": 200, "response": job}
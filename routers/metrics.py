@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+from utils.serpCache import serp_cache_stats
+from utils.intentRouter import intent_stats
+from utils.promptCodec import prompt_codec_stats
+from utils.contentCache import content_cache_stats
+from utils.jobQueue import job_queue
+from utils.singleFlight import single_flight_stats
+from utils.admission import admission_stats
+from utils.resilience import resilience_stats
+from utils.tracing import metrics_registry
+from utils.chatMemory import chat_memory_stats
+from utils.planEmbedding import plan_embedding_stats
+
+router = APIRouter()
+
+@router.get('/metrics', description="외부 API 캐시 등 서버 내부 지표 조회")
+async def get_metrics():
+    return {
+        "result_code": 200,
+        "response": {
+            "serpCache": serp_cache_stats(),
+            "intentRouter": intent_stats(),
+            "promptCodec": prompt_codec_stats(),
+            "contentCache": content_cache_stats(),
+            "jobs": job_queue.stats(),
+            "singleFlight": single_flight_stats(),
+            "admission": admission_stats(),
+            "resilience": resilience_stats(),
+            "tracing": metrics_registry.snapshot(),
+            "chatMemory": chat_memory_stats(),
+            "planEmbedding": plan_embedding_stats()
+        }
+    }
@@ -1,10 +1,14 @@
 from fastapi import FastAPI, File, UploadFile, Form, Depends, HTTPException, Request, APIRouter
 from sqlalchemy.orm import Session
 from models.models import myTrips, user, crew, tripPlans
-from database import sqldb, db, OPENAI_API_KEY, WEATHER_API_KEY, GEMINI_API_KEY
-from utils.ImageGeneration import imageGeneration
-from utils.GetWeather import getWeather
-from utils.openaiMemo import openaiMemo
+from database import sqldb, db, OPENAI_API_KEY, WEATHER_API_KEY
+from utils.GetWeather import getWeather, getWeatherBatch
+from utils.contentCache import get_trip_memo, get_trip_banner
+from utils.jobQueue import job_queue
+from utils.planEmbedding import invalidate_trip_embeddings
+from utils.admission import ProviderBusy
+from utils.resilience import CircuitOpen
+import asyncio
 import base64
 import uuid
 
@@ -57,11 +61,29 @@ async def getMyTripsTable(
 async def getWeatherInfo(city: str):
     # getWeather 함수를 호출하여 날씨 정보를 가져옴
     try:
-        weather, icon, temp = getWeather(city, WEATHER_API_KEY)
+        weather, icon, temp = await getWeather(city, WEATHER_API_KEY)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     return {"city": city, "weather": weather, "icon": icon, "temperature": temp}
 
+@router.get('/getTripsWeather', description="사용자의 모든 여행 지역 날씨 정보를 한 번에 가져오기")
+async def getTripsWeatherInfo(
+    userId: str,
+    session: Session = Depends(sqldb.sessionmaker)):
+    try:
+        trips = session.query(myTrips.tripId, myTrips.city).filter(myTrips.userId == userId).all()
+    finally:
+        session.close()
+    weathers = await getWeatherBatch([trip.city for trip in trips], WEATHER_API_KEY)
+    results = []
+    for trip in trips:
+        weather = weathers[trip.city]
+        if isinstance(weather, Exception):
+            results.append({"tripId": trip.tripId, "city": trip.city, "error": str(weather)})
+        else:
+            results.append({"tripId": trip.tripId, "city": trip.city, "weather": weather[0], "icon": weather[1], "temperature": weather[2]})
+    return {"result code": 200, "response": results}
+
 @router.post('/insertmyTrips', description="mySQL myTrips Table에 추가, tripId는 uuid로 생성")
 async def insertMyTripsTable(
     userId: str = Form(...),
@@ -74,12 +96,7 @@ async def insertMyTripsTable(
     endDate: str = Form(...),
     session: Session = Depends(sqldb.sessionmaker)
 ):
-    image_data = imageGeneration(contry, city, title, OPENAI_API_KEY)
-    image_data = base64.b64decode(image_data)
-
-    ai_memo = openaiMemo(contry, city, GEMINI_API_KEY)
-
-    
+    # 여행은 바로 만들고, 배너/메모는 백그라운드 작업으로 채운다 (진행 상황은 /jobs/{jobId}로 조회)
     try:
         tripId = str(uuid.uuid4())
         new_trip = myTrips(
@@ -92,8 +109,8 @@ async def insertMyTripsTable(
             longitude=longitude,
             startDate=startDate, 
             endDate=endDate, 
-            memo=ai_memo, 
-            banner=image_data
+            memo=None, 
+            banner=None
         )
         
         user_record = session.query(user).filter(user.userId == userId).first()
@@ -104,10 +121,40 @@ async def insertMyTripsTable(
         session.add(new_trip)
         session.commit()
         session.refresh(new_trip)
-        return {"result code": 200, "response": tripId}
+        jobId = await job_queue.enqueue("trip_content", {"tripId": tripId, "contry": contry, "city": city, "title": title})
+        return {"result code": 200, "response": tripId, "jobId": jobId}
     finally:
         session.close()
 
+async def fill_trip_content(payload):
+    # 같은 도시(와 비슷한 제목)의 메모/배너는 캐시에서 재사용, 둘 중 하나만 성공해도 저장
+    banner, memo = await asyncio.gather(
+        get_trip_banner(payload["contry"], payload["city"], payload["title"], OPENAI_API_KEY),
+        get_trip_memo(payload["contry"], payload["city"]),
+        return_exceptions=True
+    )
+    values = {}
+    if not isinstance(banner, Exception) and banner:
+        values["banner"] = base64.b64decode(banner)
+    if not isinstance(memo, Exception) and memo:
+        values["memo"] = memo
+    if values:
+        session = sqldb.sessionmaker()
+        try:
+            session.query(myTrips).filter(myTrips.tripId == payload["tripId"]).update(values)
+            session.commit()
+        finally:
+            session.close()
+    failures = [result for result in (banner, memo) if isinstance(result, Exception)]
+    errors = [repr(failure) for failure in failures]
+    if failures and not values:
+        # 외부 API가 바빠서 실패했으면 작업 큐가 잠시 뒤 다시 시도하도록 그대로 전달
+        busy = [failure for failure in failures if isinstance(failure, (ProviderBusy, CircuitOpen))]
+        if busy:
+            raise busy[0]
+        raise RuntimeError("; ".join(errors))
+    return {"banner": "banner" in values, "memo": "memo" in values, "errors": errors}
+
 @router.post("/updateUserMainTrip", description="mySQL user Table의 mainTrip 업데이트, myTripPage에서 사용")
 async def update_user_main_trip(
     request: Request,
@@ -187,6 +234,7 @@ async def delete_trip(
         ChatData_collection.delete_many({"userId": user_id, "tripId": trip_id})
         SavePlace_collection.delete_many({"userId": user_id, "tripId": trip_id})
         SerpData_collection.delete_many({"userId": user_id, "tripId": trip_id})
+        invalidate_trip_embeddings(trip_id)
 
         # 변경사항 커밋
         session.commit()
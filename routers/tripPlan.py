@@ -1,13 +1,34 @@
 from fastapi import FastAPI, File, UploadFile, Form, Depends, HTTPException, Request, APIRouter
 from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from typing import List, Optional
 from models.models import tripPlans
 from database import sqldb , db
+from utils.planEmbedding import invalidate_plan_embeddings
+from utils.routeOptimizer import optimize_route
+from utils.planStore import insert_trip_plans_bulk, clear_saved_places
 import base64
 import uuid
 
 
 router = APIRouter()
 
+class TripPlanItem(BaseModel):
+    title: str
+    date: str
+    time: str
+    place: str
+    address: str
+    latitude: float
+    longitude: float
+    description: str
+    crewId: Optional[str] = None
+
+class TripPlansBatchRequest(BaseModel):
+    userId: str
+    tripId: str
+    plans: List[TripPlanItem]
+
 @router.get('/getTripPlans', description = "mySQL tripPlans Table 접근해서 정보 가져오기, tripId는 선택사항")
 async def getTripPlansTable(
     tripId: str = None,
@@ -36,6 +57,60 @@ async def getTripPlansDateTable(
         session.close()
 
 
+@router.get('/optimizeTripPlansRoute', description = "이동 거리가 짧아지도록 일정 순서 제안, date가 없으면 여행 전체를 날짜별로 최적화, crewId가 있는 일정은 제외")
+async def optimizeTripPlansRoute(
+    tripId: str,
+    date: str = None,
+    session: Session = Depends(sqldb.sessionmaker)):
+    try:
+        query = session.query(tripPlans).filter(tripPlans.tripId == tripId)
+        if date is not None:
+            query = query.filter(tripPlans.date == date)
+        tripplans_data = query.all()
+
+        plans_by_date = {}
+        for plan in tripplans_data:
+            if plan.crewId:
+                continue
+            plans_by_date.setdefault(plan.date, []).append(plan)
+
+        results = []
+        total_before = 0.0
+        total_after = 0.0
+        for plan_date in sorted(plans_by_date):
+            # 기존 시간 순서의 첫 일정을 출발점으로 고정하고, 기존 시간대를 새 순서에 그대로 다시 배정
+            plans = sorted(plans_by_date[plan_date], key=lambda plan: plan.time)
+            order, before, after = optimize_route([plan.latitude for plan in plans], [plan.longitude for plan in plans])
+            times = [plan.time for plan in plans]
+            total_before += before
+            total_after += after
+            results.append({
+                "date": plan_date,
+                "distanceBefore": round(before, 3),
+                "distanceAfter": round(after, 3),
+                "plans": [
+                    {
+                        "planId": plans[index].planId,
+                        "title": plans[index].title,
+                        "place": plans[index].place,
+                        "latitude": plans[index].latitude,
+                        "longitude": plans[index].longitude,
+                        "time": plans[index].time,
+                        "proposedTime": times[position]
+                    }
+                    for position, index in enumerate(order)
+                ]
+            })
+        return {"result code": 200, "response": {
+            "tripId": tripId,
+            "distanceBefore": round(total_before, 3),
+            "distanceAfter": round(total_after, 3),
+            "days": results
+        }}
+    finally:
+        session.close()
+
+
 @router.post('/insertTripPlans', description="mySQL tripPlans Table에 추가, planId는 uuid로 생성")
 async def insertTripPlansTable(
     userId :  str = Form(...),
@@ -68,6 +143,26 @@ async def insertTripPlansTable(
     finally:
         session.close()
 
+@router.post('/insertTripPlansBatch', description="mySQL tripPlans Table에 여러 일정을 한 트랜잭션으로 추가, planId는 uuid로 생성")
+async def insertTripPlansBatchTable(
+    request: TripPlansBatchRequest,
+    session: Session = Depends(sqldb.sessionmaker)
+):
+    try:
+        datas = [plan.model_dump() for plan in request.plans]
+        try:
+            planIds = insert_trip_plans_bulk(session, request.userId, request.tripId, datas)
+        except Exception as e:
+            session.rollback()
+            # DB 오류 내용은 로그에만 남김
+            print(f"Failed to insert trip plans: {e}")
+            return {"result code": 500, "response": "Failed to insert trip plans"}
+        # 커밋이 성공한 뒤에만 mongoDB SavePlace에서 해당 장소 삭제
+        clear_saved_places(request.userId, request.tripId, places=[data["place"] for data in datas])
+        return {"result code": 200, "response": planIds}
+    finally:
+        session.close()
+
 @router.delete('/deleteTripPlan', description="mySQL tripPlans Table에서 특정 요청 삭제")
 async def deleteTripPlanTable(
     planId: str,
@@ -78,6 +173,7 @@ async def deleteTripPlanTable(
         if tripplans_data:
             session.delete(tripplans_data)
             session.commit()
+            invalidate_plan_embeddings([planId])
             return {"result code": 200, "response": "Plan deleted successfully"}
         else:
             return {"result code": 404, "response": "Plan not found"}
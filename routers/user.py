@@ -7,6 +7,8 @@ from database import sqldb, KAKAO_CLIENT_ID, KAKAO_REDIRECT_URI
 import base64
 import uuid
 import httpx
+from utils.resilience import call_with_resilience, raise_for_retryable_status, CircuitOpen, RETRYABLE_EXCEPTIONS, RESILIENCE_POLICIES
+from utils.tracing import trace_span
 
 router = APIRouter()
 
@@ -226,6 +228,19 @@ async def login(
 def kakao_login():
     kakao_auth_url = f"https://kauth.kakao.com/oauth/authorize?client_id={KAKAO_CLIENT_ID}&redirect_uri={KAKAO_REDIRECT_URI}&response_type=code"
     return RedirectResponse(url=kakao_auth_url)
+
+async def kakao_request(operation, send, policy="kakao"):
+    # 카카오 API 호출: 마감 시간/재시도/서킷 브레이커 적용, 장애 시 502/503으로 응답
+    async def call():
+        return raise_for_retryable_status(await send())
+    try:
+        with trace_span("kakao", operation):
+            return await call_with_resilience(policy, call)
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except RETRYABLE_EXCEPTIONS as e:
+        raise HTTPException(status_code=502, detail=f"Kakao is not responding: {e}")
+
 @router.get("/login/callback")
 async def kakao_login_callback(code: str):
     session = sqldb.sessionmaker()
@@ -238,8 +253,8 @@ async def kakao_login_callback(code: str):
             "code": code,
         }
 
-        async with httpx.AsyncClient() as client:
-            token_response = await client.post(token_url, data=token_params)
+        async with httpx.AsyncClient(timeout=RESILIENCE_POLICIES["kakao"]["timeout"]) as client:
+            token_response = await kakao_request("oauth_token", lambda: client.post(token_url, data=token_params), policy="kakao_token")
             if token_response.status_code != 200:
                 raise HTTPException(status_code=token_response.status_code, detail="Failed to fetch access token from Kakao")
 
@@ -248,7 +263,7 @@ async def kakao_login_callback(code: str):
 
             profile_url = "https://kapi.kakao.com/v2/user/me"
             headers = {"Authorization": f"Bearer {access_token}"}
-            profile_response = await client.get(profile_url, headers=headers)
+            profile_response = await kakao_request("user_me", lambda: client.get(profile_url, headers=headers))
             if profile_response.status_code != 200:
                 raise HTTPException(status_code=profile_response.status_code, detail="Failed to fetch user profile from Kakao")
 
@@ -0,0 +1,29 @@
+import pytest
+from utils.intentRouter import classify_intent
+
+@pytest.mark.parametrize("query, intent", [
+    ("여행 일정 짜줘", "save_plan"),
+    ("저장한 장소들로 일정 만들어줘", "save_plan"),
+    ("최종 일정 만들어 주세요", "save_plan"),
+    ("3시로 바꿔줘", "update_trip_plan"),
+    ("첫째 날 일정 14시로 변경해줘", "update_trip_plan"),
+    ("2번 저장해줘", "save_place"),
+])
+def test_clear_requests_skip_llm_router(query, intent):
+    assert classify_intent(query) == intent
+
+@pytest.mark.parametrize("query", [
+    # 질문/조건문은 일정을 확정하거나 바꾸지 않는다
+    "파리에서 3박 일정 짜려면 며칠이 좋아",
+    "일정 만들까",
+    "일정 짜기 좋아",
+    "일정 계획 짜는 법",
+    "여행 일정 짜줘?",
+    # 시내, 서울시처럼 '시'가 들어간 단어는 시간 변경이 아님
+    "시내 맛집 말고 다른 데로 바꿔줘",
+    "서울시로 바꿔줘",
+    "도시를 바꿔줘",
+    "파리 맛집 추천해줘",
+])
+def test_questions_and_ambiguous_requests_fall_back(query):
+    assert classify_intent(query) is None
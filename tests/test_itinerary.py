@@ -0,0 +1,88 @@
+import collections
+import pytest
+from utils.itinerary import solve_itinerary, is_meal_place, pace_profile, sight_slots_for, MEAL_SLOTS
+
+def place(i, latitude=41.38, longitude=2.17, **extra):
+    return {"title": f"장소{i}", "address": f"주소{i}", "latitude": latitude, "longitude": longitude, **extra}
+
+def times_by_day(plans):
+    days = collections.defaultdict(list)
+    for plan in plans:
+        days[plan["date"]].append(plan["time"])
+    return days
+
+def test_overflow_is_skipped_instead_of_clamped_to_midnight():
+    places = [place(i, 41.38 + i * 0.001) for i in range(12)]
+    plans, skipped = solve_itinerary(places, "2024-08-01", "2024-08-01")
+    times = [plan["time"] for plan in plans]
+    assert len(times) == len(set(times))
+    assert "23:59:00" not in times
+    assert len(plans) + len(skipped) == 12
+    assert len(plans) == len(sight_slots_for(pace_profile({}))) + len(MEAL_SLOTS)
+
+def test_overflow_spills_to_days_with_room():
+    # 첫날에 날짜가 정해진 장소가 가득 있어도 남는 장소는 다른 날로 간다
+    places = [place(i, 41.38 + i * 0.001, date="2024-08-01") for i in range(5)]
+    places += [place(10 + i, 41.38 + i * 0.001) for i in range(5)]
+    plans, skipped = solve_itinerary(places, "2024-08-01", "2024-08-02")
+    assert skipped == []
+    for times in times_by_day(plans).values():
+        assert len(times) == len(set(times))
+
+@pytest.mark.filterwarnings("error")
+def test_pinned_places_do_not_leave_a_day_empty():
+    places = [place(i, 41.38 + i * 0.01) for i in range(6)]
+    for i in range(3):
+        places[i]["date"] = "2024-08-02"
+    plans, skipped = solve_itinerary(places, "2024-08-01", "2024-08-03")
+    counts = collections.Counter(plan["date"] for plan in plans)
+    assert skipped == []
+    assert counts["2024-08-02"] == 3
+    assert set(counts) == {"2024-08-01", "2024-08-02", "2024-08-03"}
+
+@pytest.mark.filterwarnings("error")
+def test_more_days_than_places():
+    plans, skipped = solve_itinerary([place(0), place(1, 41.5)], "2024-08-01", "2024-08-05")
+    assert len(plans) == 2 and skipped == []
+
+def test_pinned_time_is_kept_and_not_reused():
+    places = [place(0, time="15:00")] + [place(i, 41.38 + i * 0.001) for i in range(1, 5)]
+    plans, _ = solve_itinerary(places, "2024-08-01", "2024-08-01")
+    times = {plan["place"]: plan["time"] for plan in plans}
+    assert times["장소0"] == "15:00:00"
+    others = [time for title, time in times.items() if title != "장소0"]
+    assert all(abs(int(t[:2]) * 60 + int(t[3:5]) - 15 * 60) >= 60 for t in others)
+
+def test_pace_depends_on_personality():
+    relaxed = sight_slots_for(pace_profile({"schedule": "schedule1"}))
+    packed = sight_slots_for(pace_profile({"schedule": "schedule2"}))
+    assert len(relaxed) < len(packed)
+    assert relaxed[0] != packed[0]
+    near = sight_slots_for(pace_profile({"schedule": "schedule2", "transport": "transport1"}))
+    far = sight_slots_for(pace_profile({"schedule": "schedule2", "transport": "transport2"}))
+    assert len(near) > len(far)
+
+def test_sight_slots_avoid_meal_times():
+    for personality in ({}, {"schedule": "schedule1"}, {"schedule": "schedule2", "transport": "transport1"}):
+        for slot in sight_slots_for(pace_profile(personality)):
+            assert slot not in MEAL_SLOTS
+
+def test_places_without_coordinates_produce_no_plans():
+    plans, skipped = solve_itinerary([{"title": "좌표 없음"}], "2024-08-01", "2024-08-02")
+    assert plans == [] and skipped == []
+
+def test_duplicate_places_are_scheduled_once():
+    plans, _ = solve_itinerary([place(0), place(0), [place(0)]], "2024-08-01", "2024-08-01")
+    assert len(plans) == 1
+
+@pytest.mark.parametrize("candidate, expected", [
+    ({"title": "Museu Picasso de Barcelona"}, False),
+    ({"title": "Barceloneta Beach"}, False),
+    ({"title": "Teatre Grec"}, False),
+    ({"title": "Pub Street", "type": "Tourist attraction"}, False),
+    ({"title": "El Xampanyet", "type": "Tapas bar"}, True),
+    ({"title": "Café de Flore"}, True),
+    ({"title": "광장시장 맛집"}, True),
+])
+def test_is_meal_place(candidate, expected):
+    assert is_meal_place(candidate) is expected
@@ -0,0 +1,37 @@
+from utils.jsonStream import JSONArrayStreamParser, parse_array, parse_object
+
+def parsed(items):
+    return [item for _, item in items]
+
+def test_parse_array_skips_brackets_in_leading_prose():
+    assert parsed(parse_array('Here is [note]: [{"i": 0}]')) == [{"i": 0}]
+
+def test_parse_array_ignores_brackets_and_braces_inside_strings():
+    text = '[{"i": 0, "title": "a]b{c"}, {"i": 1}]'
+    assert parsed(parse_array(text)) == [{"i": 0, "title": "a]b{c"}, {"i": 1}]
+
+def test_parse_array_stops_at_closing_bracket():
+    assert parsed(parse_array('[{"i": 0}] 그리고 [{"i": 1}]')) == [{"i": 0}]
+
+def test_stream_parser_handles_one_character_chunks():
+    parser = JSONArrayStreamParser()
+    items = []
+    for ch in '```json\n[참고] 아래는 결과예요\n[\n  {"i": 0, "title": "에펠탑 관광"},\n  {"i": 1}\n]\n```':
+        items += parser.feed(ch)
+    assert parsed(items) == [{"i": 0, "title": "에펠탑 관광"}, {"i": 1}]
+    assert parser.done
+
+def test_stream_parser_returns_objects_as_soon_as_they_close():
+    parser = JSONArrayStreamParser()
+    assert parsed(parser.feed('[{"i": 0}, {"i"')) == [{"i": 0}]
+    assert parser.pending_fragment() == '{"i"'
+    assert parsed(parser.feed(': 1}]')) == [{"i": 1}]
+
+def test_malformed_object_is_returned_with_none():
+    items = parse_array('[{"i": 0 "title": "x"}, {"i": 1}]')
+    assert items[0] == ('{"i": 0 "title": "x"}', None)
+    assert items[1][1] == {"i": 1}
+
+def test_parse_object_repairs_trailing_comma_and_smart_quotes():
+    assert parse_object('{"i": 1,}') == {"i": 1}
+    assert parse_object('{“i”: 1}') == {"i": 1}
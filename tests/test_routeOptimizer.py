@@ -0,0 +1,48 @@
+import numpy as np
+from utils.routeOptimizer import haversine_matrix, route_distance, nearest_neighbor_route, two_opt, optimize_route
+
+def test_haversine_matrix_is_symmetric_with_zero_diagonal():
+    distances = haversine_matrix([37.5665, 35.1796, 33.4996], [126.9780, 129.0756, 126.5312])
+    assert np.allclose(distances, distances.T)
+    assert np.allclose(np.diag(distances), 0.0)
+    # 서울-부산 약 325km
+    assert 320 < distances[0, 1] < 330
+
+def test_empty_and_single_point():
+    assert optimize_route([], []) == ([], 0.0, 0.0)
+    assert optimize_route([37.5], [127.0]) == ([0], 0.0, 0.0)
+
+def test_shuffled_points_on_a_line_come_out_in_order():
+    longitudes = [127.00, 127.04, 127.01, 127.03, 127.02, 127.05]
+    order, before, after = optimize_route([37.5] * 6, longitudes)
+    assert [longitudes[i] for i in order] == sorted(longitudes)
+    assert after < before
+
+def test_start_is_fixed_and_order_is_a_permutation():
+    rng = np.random.default_rng(0)
+    latitudes = 37.5 + rng.random(12) * 0.1
+    longitudes = 127.0 + rng.random(12) * 0.1
+    order, _, _ = optimize_route(latitudes, longitudes, start=3)
+    assert order[0] == 3
+    assert sorted(order) == list(range(12))
+
+def test_two_opt_never_worse_than_nearest_neighbor():
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        distances = haversine_matrix(37.5 + rng.random(10) * 0.1, 127.0 + rng.random(10) * 0.1)
+        initial = nearest_neighbor_route(distances)
+        improved = two_opt(distances, initial)
+        assert route_distance(distances, improved) <= route_distance(distances, initial) + 1e-9
+
+def test_two_opt_removes_a_crossing():
+    # 0 -> 2 -> 1 -> 3 은 사각형 안에서 교차하는 경로, 한 번 뒤집으면 0 -> 1 -> 2 -> 3
+    latitudes = [37.50, 37.50, 37.51, 37.51]
+    longitudes = [127.00, 127.01, 127.01, 127.00]
+    distances = haversine_matrix(latitudes, longitudes)
+    assert two_opt(distances, [0, 2, 1, 3]) == [0, 1, 2, 3]
+
+def test_never_longer_than_original_order():
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        order, before, after = optimize_route(37.5 + rng.random(8) * 0.1, 127.0 + rng.random(8) * 0.1)
+        assert after <= before
@@ -1,22 +1,147 @@
-import requests
-from deep_translator import GoogleTranslator
-
-def getWeather(city, WEATHER_API_KEY):
-    # 영어로 번역
-    city = GoogleTranslator(source='ko', target='en').translate(city)
-    
-    api = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={WEATHER_API_KEY}&units=metric"
-    
-    result = requests.get(api)
+import asyncio
+import time
+import httpx
+from database import get_setting
+from utils.translator import translate
+from utils.singleFlight import single_flight
+from utils.resilience import call_with_resilience, raise_for_retryable_status
+from utils.tracing import trace_span
+
+# OpenWeatherMap 현재 날씨 조회
+# 도시 이름은 자주 쓰는 도시 표 -> (영문이면 그대로) -> 번역 순서로 영문 이름을 정하고,
+# 그 이름을 키로 TTL 캐시를 두어 같은 도시는 잠시 동안 다시 조회하지 않는다
+# 날씨 API가 실패하거나 서킷이 열려 있으면 WEATHER_STALE_SECONDS 안의 지난 값을 대신 반환
+
+WEATHER_API_URL = "http://api.openweathermap.org/data/2.5/weather"
+WEATHER_CACHE_TTL_SECONDS = get_setting("WEATHER_CACHE_TTL_SECONDS", 60 * 10)
+WEATHER_STALE_SECONDS = get_setting("WEATHER_STALE_SECONDS", 60 * 60 * 6)
+WEATHER_CACHE_SIZE = get_setting("WEATHER_CACHE_SIZE", 5000)
+WEATHER_TIMEOUT = get_setting("WEATHER_TIMEOUT", 10)
+WEATHER_POOL_SIZE = get_setting("WEATHER_POOL_SIZE", 20)
+
+CITY_NAMES = {
+    "서울": "Seoul", "부산": "Busan", "제주": "Jeju", "제주도": "Jeju", "인천": "Incheon", "대구": "Daegu",
+    "대전": "Daejeon", "광주": "Gwangju", "강릉": "Gangneung", "경주": "Gyeongju", "여수": "Yeosu", "속초": "Sokcho",
+    "도쿄": "Tokyo", "오사카": "Osaka", "교토": "Kyoto", "후쿠오카": "Fukuoka", "삿포로": "Sapporo",
+    "나고야": "Nagoya", "오키나와": "Okinawa", "요코하마": "Yokohama", "나라": "Nara",
+    "베이징": "Beijing", "상하이": "Shanghai", "홍콩": "Hong Kong", "마카오": "Macau", "타이베이": "Taipei",
+    "방콕": "Bangkok", "치앙마이": "Chiang Mai", "푸켓": "Phuket", "다낭": "Da Nang", "하노이": "Hanoi",
+    "호치민": "Ho Chi Minh City", "나트랑": "Nha Trang", "싱가포르": "Singapore", "쿠알라룸푸르": "Kuala Lumpur",
+    "세부": "Cebu", "마닐라": "Manila", "발리": "Denpasar", "자카르타": "Jakarta",
+    "파리": "Paris", "런던": "London", "로마": "Rome", "밀라노": "Milan", "베네치아": "Venice", "피렌체": "Florence",
+    "바르셀로나": "Barcelona", "마드리드": "Madrid", "리스본": "Lisbon", "암스테르담": "Amsterdam",
+    "베를린": "Berlin", "뮌헨": "Munich", "프라하": "Prague", "빈": "Vienna", "부다페스트": "Budapest",
+    "취리히": "Zurich", "인터라켄": "Interlaken", "이스탄불": "Istanbul", "아테네": "Athens",
+    "뉴욕": "New York", "로스앤젤레스": "Los Angeles", "샌프란시스코": "San Francisco", "라스베이거스": "Las Vegas",
+    "시애틀": "Seattle", "하와이": "Honolulu", "호놀룰루": "Honolulu", "괌": "Guam", "사이판": "Saipan",
+    "밴쿠버": "Vancouver", "토론토": "Toronto", "시드니": "Sydney", "멜버른": "Melbourne", "두바이": "Dubai"
+}
+
+_weather_cache = {}
+_resolved_names = {}
+_client = None
+
+def _get_client():
+    # 모든 날씨 요청이 같은 커넥션 풀을 사용
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=WEATHER_TIMEOUT,
+            limits=httpx.Limits(max_connections=WEATHER_POOL_SIZE, max_keepalive_connections=WEATHER_POOL_SIZE)
+        )
+    return _client
+
+async def close_weather_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def resolve_city(city):
+    name = " ".join((city or "").split())
+    if name in CITY_NAMES:
+        return CITY_NAMES[name]
+    if name.isascii():
+        return name
+    if name in _resolved_names:
+        return _resolved_names[name]
+    translated = await translate(name, source='ko', target='en')
+    # 번역에 실패하면 원문이 그대로 오므로 기억하지 않음
+    if translated and translated != name:
+        _resolved_names[name] = translated
+    return translated
+
+def _cache_get(key, stale=False):
+    # stale=True면 만료됐어도 WEATHER_STALE_SECONDS 안의 값은 반환
+    entry = _weather_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, value = entry
+    now = time.monotonic()
+    if expires_at + WEATHER_STALE_SECONDS < now:
+        del _weather_cache[key]
+        return None
+    if expires_at < now and not stale:
+        return None
+    return value
+
+def _cache_set(key, value):
+    if len(_weather_cache) >= WEATHER_CACHE_SIZE:
+        # 가득 차면 만료된 항목부터 정리하고, 그래도 많으면 가장 먼저 넣은 항목 제거
+        now = time.monotonic()
+        for expired in [k for k, (expires_at, _) in _weather_cache.items() if expires_at + WEATHER_STALE_SECONDS < now]:
+            del _weather_cache[expired]
+        while len(_weather_cache) >= WEATHER_CACHE_SIZE:
+            del _weather_cache[next(iter(_weather_cache))]
+    _weather_cache[key] = (time.monotonic() + WEATHER_CACHE_TTL_SECONDS, value)
+
+# 같은 도시를 동시에 조회하면 한 번만 요청
+@single_flight("weather", key=lambda city, WEATHER_API_KEY: " ".join((city or "").split()).lower())
+async def getWeather(city, WEATHER_API_KEY):
+    # (날씨, 아이콘, 기온) 반환
+    city = await resolve_city(city)
+    with trace_span("weather", "current") as span:
+        return await _get_weather(city, WEATHER_API_KEY, span)
+
+async def _get_weather(city, WEATHER_API_KEY, span):
+    key = city.lower()
+    cached = _cache_get(key)
+    if cached is not None:
+        span.set_cache("hit")
+        return cached
+
+    span.set_cache("miss")
+    stale = _cache_get(key, stale=True)
+    result = await call_with_resilience(
+        "weather",
+        lambda: _fetch(city, WEATHER_API_KEY),
+        timeout=WEATHER_TIMEOUT,
+        fallback=(lambda: stale) if stale is not None else None
+    )
+    if isinstance(result, tuple):
+        # 지난 캐시 값으로 대신 응답한 경우
+        span.set_cache("stale")
+        return result
     if result.status_code != 200:
         raise Exception(f"Failed to get weather data: {result.status_code} {result.text}")
-    
+
     data = result.json()
-    
+
     if 'weather' not in data or 'main' not in data:
         raise Exception("Invalid response from weather API")
-    
+
     weather = data['weather'][0]['main']
     icon = data['weather'][0]['icon']
     temp = round(data['main']['temp'])
-    return weather, icon, temp
\ No newline at end of file
+    _cache_set(key, (weather, icon, temp))
+    return weather, icon, temp
+
+async def _fetch(city, WEATHER_API_KEY):
+    response = await _get_client().get(WEATHER_API_URL, params={"q": city, "appid": WEATHER_API_KEY, "units": "metric"})
+    return raise_for_retryable_status(response)
+
+async def getWeatherBatch(cities, WEATHER_API_KEY):
+    # {도시: (날씨, 아이콘, 기온) 또는 예외} - 같은 도시는 한 번만 조회
+    unique = list(dict.fromkeys(cities))
+    results = await asyncio.gather(*(getWeather(city, WEATHER_API_KEY) for city in unique), return_exceptions=True)
+    return dict(zip(unique, results))
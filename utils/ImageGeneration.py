@@ -1,25 +1,37 @@
 import openai
-import requests
-from io import BytesIO
+import httpx
 import base64
-from deep_translator import GoogleTranslator
+from utils.translator import translate
+from utils.resilience import call_with_resilience, raise_for_retryable_status, RESILIENCE_POLICIES
+from utils.tracing import trace_span
 
-def imageGeneration(contry, city, title, OPENAI_API_KEY):
+async def imageGeneration(contry, city, title, OPENAI_API_KEY):
     # OpenAI API 키 설정
     openai.api_key = OPENAI_API_KEY
-    
+
     # 영어로 번역
     text = f'A beautiful travel photo of {city}, {contry}, {title}.'
-    result = GoogleTranslator(source='ko', target='en').translate(text)
-    
+    result = await translate(text, source='ko', target='en')
+
     # 이미지 생성
-    response = openai.Image.create(
-	prompt=result,
-	n=1,
-	size='1024x1024'
- )
+    def generate():
+        return openai.Image.acreate(
+            prompt=result,
+            n=1,
+            size='1024x1024',
+            request_timeout=RESILIENCE_POLICIES["openai_image"]["timeout"]
+        )
+    with trace_span("openai_image", "generate"):
+        response = await call_with_resilience("openai_image", generate, admission="openai")
     image_url = response['data'][0]['url']
-    response = requests.get(image_url)
-    img = BytesIO(response.content)
-    img_base64 = base64.b64encode(img.getvalue()).decode('utf-8')
-    return img_base64
\ No newline at end of file
+
+    # 생성된 이미지 내려받기
+    async def download():
+        async with httpx.AsyncClient(timeout=RESILIENCE_POLICIES["image_download"]["timeout"]) as client:
+            image_response = raise_for_retryable_status(await client.get(image_url))
+            image_response.raise_for_status()
+            return image_response.content
+    with trace_span("image_download", "get"):
+        content = await call_with_resilience("image_download", download)
+    img_base64 = base64.b64encode(content).decode('utf-8')
+    return img_base64
@@ -0,0 +1,129 @@
+import asyncio
+import bisect
+import contextlib
+import math
+import time
+from database import get_setting
+
+# 외부 API(OpenAI, Gemini, SerpAPI 등)별 요청 수 조절
+# 동시에 보내는 요청 수(max_in_flight)와 초당 요청 수(토큰 버킷)를 제한하고,
+# 기다리는 요청이 너무 많거나 오래 기다리면 바로 ProviderBusy로 거절해서 429를 그대로 맞지 않게 한다
+
+DEFAULT_LIMITS = {
+    # max_in_flight: 동시 요청 수, rate: 초당 요청 수, burst: 한 번에 몰아서 보낼 수 있는 수,
+    # max_queue: 대기 가능한 요청 수, max_wait: 최대 대기 시간(초)
+    "openai": {"max_in_flight": 32, "rate": 8.0, "burst": 16, "max_queue": 200, "max_wait": 20.0},
+    "gemini": {"max_in_flight": 16, "rate": 4.0, "burst": 8, "max_queue": 100, "max_wait": 20.0},
+    "serpapi": {"max_in_flight": 8, "rate": 2.0, "burst": 4, "max_queue": 50, "max_wait": 10.0}
+}
+ADMISSION_LIMITS = {**DEFAULT_LIMITS, **get_setting("ADMISSION_LIMITS", {})}
+
+# 대기 시간 히스토그램 구간(초)
+WAIT_BUCKETS = [0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0]
+
+class ProviderBusy(Exception):
+    def __init__(self, provider, retry_after):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"{provider} is busy, retry after {retry_after}s")
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        # 토큰을 하나 쓰면 0, 모자라면 다음 토큰까지 남은 시간(초)
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class AdmissionController:
+    def __init__(self, name, max_in_flight, rate, burst, max_queue, max_wait):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.bucket = TokenBucket(rate, burst)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        # Python 3.9의 Semaphore는 생성 시점의 이벤트 루프에 묶이므로 처음 쓸 때 만든다
+        self.semaphore = None
+        self.waiting = 0
+        self.in_flight = 0
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS) + 1)
+        self.counters = {"admitted": 0, "shed_queue_full": 0, "shed_timeout": 0}
+
+    def _retry_after(self):
+        return max(1, math.ceil((self.waiting + 1) / self.bucket.rate))
+
+    async def _acquire(self):
+        await self.semaphore.acquire()
+        try:
+            while True:
+                delay = self.bucket.take()
+                if delay == 0:
+                    return
+                await asyncio.sleep(delay)
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+    async def acquire(self):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        if self.waiting >= self.max_queue:
+            self.counters["shed_queue_full"] += 1
+            raise ProviderBusy(self.name, self._retry_after())
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.counters["shed_timeout"] += 1
+            raise ProviderBusy(self.name, self._retry_after())
+        finally:
+            self.waiting -= 1
+            self.wait_histogram[bisect.bisect_left(WAIT_BUCKETS, time.monotonic() - started)] += 1
+        self.in_flight += 1
+        self.counters["admitted"] += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        # 누적 히스토그램 (le_x: 대기 시간이 x초 이하인 요청 수)
+        histogram = {}
+        total = 0
+        for bound, count in zip(WAIT_BUCKETS + ["inf"], self.wait_histogram):
+            total += count
+            histogram[f"le_{bound}"] = total
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "wait_seconds_histogram": histogram
+        }
+
+_controllers = {}
+
+def get_admission(provider):
+    if provider not in _controllers:
+        _controllers[provider] = AdmissionController(provider, **ADMISSION_LIMITS[provider])
+    return _controllers[provider]
+
+def admission_stats():
+    return {name: controller.stats() for name, controller in _controllers.items()}
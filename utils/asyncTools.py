@@ -0,0 +1,24 @@
+import asyncio
+
+async def gather_with_deadline(coros, timeout):
+    # coros: {이름: 코루틴}, 공통 마감 시간 안에 끝난 결과만 모아서 반환
+    # 시간 초과/예외가 난 작업은 결과가 None이고 errors에 이유가 남는다
+    tasks = {name: asyncio.ensure_future(coro) for name, coro in coros.items()}
+    if not tasks:
+        return {}, {}
+    done, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+    for task in pending:
+        task.cancel()
+
+    results = {}
+    errors = {}
+    for name, task in tasks.items():
+        if task in pending:
+            results[name] = None
+            errors[name] = "timeout"
+        elif task.exception() is not None:
+            results[name] = None
+            errors[name] = repr(task.exception())
+        else:
+            results[name] = task.result()
+    return results, errors
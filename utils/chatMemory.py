@@ -0,0 +1,240 @@
+import time
+import asyncio
+from collections import OrderedDict
+from database import db, get_setting
+from utils.tokenCounter import estimate_tokens, MESSAGE_OVERHEAD_TOKENS
+from utils.llmClient import gemini_generate
+
+# (userId, tripId)별 대화 메모리
+# 대화마다 토큰 예산 안에서 최근 메시지만 유지하고, 오래 쓰지 않은 대화는 메모리에서 내린다
+
+MEMORY_TOKEN_BUDGET = get_setting("MEMORY_TOKEN_BUDGET", 2000)
+MEMORY_IDLE_SECONDS = get_setting("MEMORY_IDLE_SECONDS", 60 * 60)
+MEMORY_MAX_CONVERSATIONS = get_setting("MEMORY_MAX_CONVERSATIONS", 5000)
+MEMORY_PERSIST = get_setting("MEMORY_PERSIST", True)
+
+# 원문 대화가 이 토큰 수를 넘으면 오래된 턴을 요약으로 접고, 최근 SUMMARY_KEEP_TURNS 턴만 원문으로 유지
+SUMMARY_TRIGGER_TOKENS = get_setting("SUMMARY_TRIGGER_TOKENS", 1200)
+SUMMARY_KEEP_TURNS = get_setting("SUMMARY_KEEP_TURNS", 3)
+
+# 유휴 대화 정리 주기(초)
+EVICT_INTERVAL_SECONDS = 60
+
+ChatData_collection = db['ChatData']
+
+chat_memory_counters = {
+    "prompts": 0,
+    "summarized_prompts": 0,
+    "tokens_saved": 0,
+    "summaries": 0,
+    "folded_messages": 0,
+    "folded_tokens": 0
+}
+
+class ConversationMemory:
+    def __init__(self, userId, tripId, token_budget=MEMORY_TOKEN_BUDGET, messages=None, summary="", folded_tokens=0):
+        self.userId = userId
+        self.tripId = tripId
+        self.token_budget = token_budget
+        self.messages = []
+        self.token_count = 0
+        self.last_access = time.monotonic()
+        # 요약으로 접힌 이전 대화와, 접힌 원문의 누적 토큰 수
+        self.summary = summary or ""
+        self.folded_tokens = folded_tokens or 0
+        self.summarizing = False
+        for msg in messages or []:
+            self._append(msg["role"], msg["content"])
+        self._trim()
+
+    def _append(self, role, content):
+        content = content or ""
+        self.messages.append({"role": role, "content": content})
+        self.token_count += estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+    def _trim(self):
+        # 예산을 넘으면 가장 오래된 메시지부터 제거 (마지막 메시지는 항상 유지)
+        while self.token_count > self.token_budget and len(self.messages) > 1:
+            removed = self.messages.pop(0)
+            self.token_count -= estimate_tokens(removed["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+    def add_message(self, role, content):
+        self._append(role, content or "")
+        self._trim()
+        self.last_access = time.monotonic()
+
+    def save_context(self, user_input, output):
+        if user_input:
+            self._append("user", user_input)
+        self._append("assistant", output or "")
+        self._trim()
+        self.last_access = time.monotonic()
+
+    def get_messages(self):
+        self.last_access = time.monotonic()
+        return list(self.messages)
+
+    def build_prompt_messages(self):
+        # 요약 + 최근 원문 메시지, 그리고 요약 덕분에 아낀 토큰 수
+        messages = self.get_messages()
+        tokens_saved = 0
+        if self.summary:
+            summary_content = f"Summary of the earlier conversation: {self.summary}"
+            messages = [{"role": "system", "content": summary_content}] + messages
+            tokens_saved = max(0, self.folded_tokens - estimate_tokens(summary_content) - MESSAGE_OVERHEAD_TOKENS)
+            chat_memory_counters["summarized_prompts"] += 1
+            chat_memory_counters["tokens_saved"] += tokens_saved
+        chat_memory_counters["prompts"] += 1
+        return messages, tokens_saved
+
+    def needs_summary(self):
+        return (not self.summarizing
+                and self.token_count > SUMMARY_TRIGGER_TOKENS
+                and len(self.messages) > SUMMARY_KEEP_TURNS * 2)
+
+    def clear(self):
+        self.messages = []
+        self.token_count = 0
+        self.summary = ""
+        self.folded_tokens = 0
+
+
+class ConversationMemoryStore:
+    def __init__(self, token_budget=MEMORY_TOKEN_BUDGET, idle_seconds=MEMORY_IDLE_SECONDS,
+                 max_conversations=MEMORY_MAX_CONVERSATIONS, persist=MEMORY_PERSIST):
+        self.token_budget = token_budget
+        self.idle_seconds = idle_seconds
+        self.max_conversations = max_conversations
+        self.persist = persist
+        self.conversations = OrderedDict()
+        self.last_evict = time.monotonic()
+        self.summary_tasks = set()
+
+    def get(self, userId, tripId):
+        self.evict_idle()
+        key = (userId, tripId)
+        conversation = self.conversations.get(key)
+        if conversation is None:
+            conversation = ConversationMemory(userId, tripId, self.token_budget, **self._load(userId, tripId))
+            self.conversations[key] = conversation
+            while len(self.conversations) > self.max_conversations:
+                self.conversations.popitem(last=False)
+        else:
+            self.conversations.move_to_end(key)
+        return conversation
+
+    def save(self, conversation):
+        if not self.persist:
+            return
+        try:
+            ChatData_collection.update_one(
+                {"userId": conversation.userId, "tripId": conversation.tripId},
+                {
+                    "$set": {
+                        "memory": conversation.messages,
+                        "memorySummary": conversation.summary,
+                        "memoryFoldedTokens": conversation.folded_tokens
+                    },
+                    "$setOnInsert": {"userId": conversation.userId, "tripId": conversation.tripId}
+                },
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Failed to persist chat memory: {e}")
+
+    def reset(self, userId, tripId):
+        conversation = self.get(userId, tripId)
+        conversation.clear()
+        self.save(conversation)
+        return conversation
+
+    def clear(self, userId, tripId=None):
+        # 다른 사용자의 대화까지 지우지 않도록 userId는 반드시 지정
+        if not userId:
+            raise ValueError("userId is required to clear chat memory")
+        for key in [key for key in self.conversations if key[0] == userId and (tripId is None or key[1] == tripId)]:
+            del self.conversations[key]
+        if not self.persist:
+            return
+        query = {"userId": userId}
+        if tripId is not None:
+            query["tripId"] = tripId
+        ChatData_collection.update_many(query, {"$set": {"memory": [], "memorySummary": "", "memoryFoldedTokens": 0}})
+
+    def schedule_summary(self, conversation):
+        # 응답을 지연시키지 않도록 요약은 백그라운드에서 수행
+        if not conversation.needs_summary():
+            return
+        conversation.summarizing = True
+        task = asyncio.create_task(self.summarize(conversation))
+        self.summary_tasks.add(task)
+        task.add_done_callback(self.summary_tasks.discard)
+
+    async def summarize(self, conversation):
+        try:
+            folded = conversation.messages[:-SUMMARY_KEEP_TURNS * 2]
+            if not folded:
+                return
+            transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in folded if msg["content"])
+            prompt = (
+                "다음은 여행 계획 챗봇과 사용자의 대화입니다. 기존 요약과 새 대화를 합쳐서 "
+                "사용자의 여행 선호, 저장한 장소, 결정된 일정 등 이후 대화에 필요한 정보만 한국어 300자 이내로 요약해줘.\n"
+                f"[기존 요약]\n{conversation.summary or '없음'}\n[새 대화]\n{transcript}"
+            )
+            summary = (await gemini_generate(prompt)).strip()
+            folded_ids = {id(msg) for msg in folded}
+            folded_tokens = sum(estimate_tokens(msg["content"]) + MESSAGE_OVERHEAD_TOKENS for msg in folded)
+            # 요약하는 동안 trim으로 이미 빠진 메시지가 있을 수 있으므로 남아있는 것만 제거
+            remaining = [msg for msg in conversation.messages if id(msg) not in folded_ids]
+            conversation.messages = remaining
+            conversation.token_count = sum(estimate_tokens(msg["content"]) + MESSAGE_OVERHEAD_TOKENS for msg in remaining)
+            conversation.summary = summary
+            conversation.folded_tokens += folded_tokens
+            chat_memory_counters["summaries"] += 1
+            chat_memory_counters["folded_messages"] += len(folded)
+            chat_memory_counters["folded_tokens"] += folded_tokens
+            self.save(conversation)
+        except Exception as e:
+            print(f"Failed to summarize chat memory: {e}")
+        finally:
+            conversation.summarizing = False
+
+    def evict_idle(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_evict < EVICT_INTERVAL_SECONDS:
+            return
+        self.last_evict = now
+        expired = [key for key, conversation in self.conversations.items() if now - conversation.last_access > self.idle_seconds]
+        for key in expired:
+            del self.conversations[key]
+
+    def _load(self, userId, tripId):
+        # 서버 재시작이나 eviction 이후에는 ChatData에서 대화를 복원
+        if not self.persist:
+            return {}
+        try:
+            document = ChatData_collection.find_one(
+                {"userId": userId, "tripId": tripId},
+                {"memory": 1, "memorySummary": 1, "memoryFoldedTokens": 1, "conversation": 1}
+            )
+        except Exception as e:
+            print(f"Failed to load chat memory: {e}")
+            return {}
+        if not document:
+            return {}
+        if document.get("memory") is not None:
+            return {
+                "messages": document["memory"],
+                "summary": document.get("memorySummary", ""),
+                "folded_tokens": document.get("memoryFoldedTokens", 0)
+            }
+        return {"messages": [
+            {"role": "assistant" if chat.get("sender") == "bot" else "user", "content": chat.get("message", "")}
+            for chat in document.get("conversation", [])
+        ]}
+
+
+memory_store = ConversationMemoryStore()
+
+def chat_memory_stats():
+    return {**chat_memory_counters, "conversations": len(memory_store.conversations)}
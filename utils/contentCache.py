@@ -0,0 +1,158 @@
+import datetime
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from database import db, get_setting
+from utils.openaiMemo import openaiMemo
+from utils.ImageGeneration import imageGeneration
+from utils.singleFlight import single_flight
+from utils.tracing import trace_span
+
+# 여행 생성 시 만드는 AI 메모/배너 이미지 캐시
+# 메모는 (나라, 도시), 배너는 (나라, 도시, 정규화한 여행 제목 묶음)이 같으면 다시 생성하지 않는다
+# 프로세스 내 LRU(hot) -> AIContentCache 컬렉션(expiresAt TTL 인덱스) -> 생성 순서로 조회
+
+MEMO_CACHE_TTL_SECONDS = get_setting("MEMO_CACHE_TTL_SECONDS", 60 * 60 * 24 * 30)
+BANNER_CACHE_TTL_SECONDS = get_setting("BANNER_CACHE_TTL_SECONDS", 60 * 60 * 24 * 90)
+MEMO_HOT_CACHE_SIZE = get_setting("MEMO_HOT_CACHE_SIZE", 2000)
+# 배너는 base64 1024x1024 이미지(개당 2~3MB)라 워커마다 메모리에는 조금만 둔다
+BANNER_HOT_CACHE_SIZE = get_setting("BANNER_HOT_CACHE_SIZE", 8)
+
+# 제목에서 지역 구분에 의미 없는 흔한 단어 (남은 단어가 없으면 도시 공통 배너 사용)
+GENERIC_TITLE_WORDS = {
+    "여행", "나의", "우리", "우리의", "내", "첫", "가족", "친구", "친구들", "혼자", "자유여행", "일정",
+    "trip", "travel", "my", "our", "the", "to", "in", "with", "tour", "vacation", "holiday"
+}
+
+AIContentCache_collection = db['AIContentCache']
+_indexes_ready = False
+
+def _ensure_indexes():
+    global _indexes_ready
+    if not _indexes_ready:
+        AIContentCache_collection.create_index("expiresAt", expireAfterSeconds=0)
+        _indexes_ready = True
+
+def normalize_text(text):
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text or "").lower()).split())
+
+def title_bucket(contry, city, title):
+    # 숫자(연도 등), 나라/도시 이름, 흔한 단어를 뺀 나머지 단어들을 정렬해서 묶음 이름으로 사용
+    place_words = set(normalize_text(contry).split()) | set(normalize_text(city).split())
+    words = set()
+    for word in normalize_text(title).split():
+        if word.isdigit() or word in GENERIC_TITLE_WORDS:
+            continue
+        if any(place_word and place_word in word for place_word in place_words):
+            continue
+        words.add(word)
+    return " ".join(sorted(words))
+
+class ContentCache:
+    def __init__(self, kind, ttl_seconds, hot_size):
+        self.kind = kind
+        self.ttl_seconds = ttl_seconds
+        self.hot_size = hot_size
+        self.hot = OrderedDict()
+        self.counters = {"hot_hits": 0, "mongo_hits": 0, "misses": 0}
+
+    def key(self, *parts):
+        raw = json.dumps([self.kind] + [normalize_text(part) for part in parts], ensure_ascii=False)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _hot_get(self, key):
+        entry = self.hot.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.hot[key]
+            return None
+        self.hot.move_to_end(key)
+        return value
+
+    def _hot_set(self, key, value, ttl_seconds):
+        self.hot[key] = (time.monotonic() + ttl_seconds, value)
+        self.hot.move_to_end(key)
+        while len(self.hot) > self.hot_size:
+            self.hot.popitem(last=False)
+
+    def get(self, key):
+        with trace_span("content_cache", self.kind) as span:
+            value = self._get(key)
+            span.set_cache("miss" if value is None else "hit")
+        return value
+
+    def _get(self, key):
+        value = self._hot_get(key)
+        if value is not None:
+            self.counters["hot_hits"] += 1
+            return value
+        try:
+            _ensure_indexes()
+            doc = AIContentCache_collection.find_one({"_id": key}, {"value": 1, "expiresAt": 1})
+        except Exception as e:
+            print(f"Failed to read {self.kind} cache: {e}")
+            doc = None
+        # TTL 인덱스 삭제는 주기적으로 돌기 때문에 만료 시각을 직접 한 번 더 확인
+        if doc is not None and doc["expiresAt"] > datetime.datetime.utcnow():
+            self.counters["mongo_hits"] += 1
+            remaining = (doc["expiresAt"] - datetime.datetime.utcnow()).total_seconds()
+            self._hot_set(key, doc["value"], remaining)
+            return doc["value"]
+        self.counters["misses"] += 1
+        return None
+
+    def set(self, key, value, meta=None):
+        self._hot_set(key, value, self.ttl_seconds)
+        try:
+            _ensure_indexes()
+            AIContentCache_collection.replace_one(
+                {"_id": key},
+                {"_id": key, "kind": self.kind, **(meta or {}), "value": value,
+                 "expiresAt": datetime.datetime.utcnow() + datetime.timedelta(seconds=self.ttl_seconds)},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Failed to write {self.kind} cache: {e}")
+
+    def stats(self):
+        lookups = sum(self.counters.values())
+        hits = self.counters["hot_hits"] + self.counters["mongo_hits"]
+        return {
+            **self.counters,
+            "hot_size": len(self.hot),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+memo_cache = ContentCache("memo", MEMO_CACHE_TTL_SECONDS, MEMO_HOT_CACHE_SIZE)
+banner_cache = ContentCache("banner", BANNER_CACHE_TTL_SECONDS, BANNER_HOT_CACHE_SIZE)
+
+async def get_trip_memo(contry, city):
+    key = memo_cache.key(contry, city)
+    memo = memo_cache.get(key)
+    if memo is not None:
+        return memo
+    memo = await openaiMemo(contry, city)
+    # 빈 응답은 캐시하지 않음
+    if memo and memo.strip():
+        memo_cache.set(key, memo, {"contry": contry, "city": city})
+    return memo
+
+@single_flight("banner", key=lambda contry, city, title, OPENAI_API_KEY: (normalize_text(contry), normalize_text(city), title_bucket(contry, city, title)))
+async def get_trip_banner(contry, city, title, OPENAI_API_KEY):
+    # base64 문자열 반환 (imageGeneration과 동일)
+    bucket = title_bucket(contry, city, title)
+    key = banner_cache.key(contry, city, bucket)
+    banner = banner_cache.get(key)
+    if banner is not None:
+        return banner
+    banner = await imageGeneration(contry, city, title, OPENAI_API_KEY)
+    if banner:
+        banner_cache.set(key, banner, {"contry": contry, "city": city, "bucket": bucket})
+    return banner
+
+def content_cache_stats():
+    return {"memo": memo_cache.stats(), "banner": banner_cache.stats()}
@@ -1,313 +1,299 @@
 import os
 import json
-import openai
-from serpapi import GoogleSearch
-from deep_translator import GoogleTranslator
 from sqlalchemy.ext.declarative import declarative_base
 import re
-import uuid
 from sqlalchemy import *
 from sqlalchemy.orm import sessionmaker
-import google.generativeai as genai
-from database import sqldb, OPENAI_API_KEY, GEMINI_API_KEY, SERP_API_KEY,db
+from database import sqldb, db, get_setting
 from models.models import myTrips, tripPlans, user
-from langchain.memory import ConversationBufferMemory
-from langchain.schema import BaseMessage, AIMessage, HumanMessage, SystemMessage
-from langchain.embeddings import OpenAIEmbeddings
-from sklearn.metrics.pairwise import cosine_similarity
 from typing import Optional
 import datetime
+import time
 from utils.openaiMemo import openaiPlanMemo
-
-openai.api_key = OPENAI_API_KEY
-
-# ConversationBufferMemory 초기화
-if 'memory' not in globals():
-    memory = ConversationBufferMemory()
+from utils.llmClient import chat_completion, chat_completion_stream, gemini_generate
+from utils.planEmbedding import invalidate_plan_embeddings
+from utils.planIndex import find_similar_plans
+from utils.translator import translate, translate_batch
+from utils.serpCache import serp_search, normalize_query, quantize
+from utils.placeRanking import rank_places_async, parse_personality
+from utils.chatMemory import memory_store
+from utils.intentRouter import classify_intent, record_router_latency
+from utils.itinerary import solve_itinerary
+from utils.planText import write_plan_texts
+from utils.planStore import insert_trip_plans_bulk, clear_saved_places
+from utils.asyncTools import gather_with_deadline
+from utils.itineraryRenderer import render_itinerary
+from utils.promptCodec import encode_rows, describe_columns
+from utils.jobQueue import job_queue
+from utils.singleFlight import single_flight
+from utils.tracing import set_function_name
 
 pending_updates = {}
 
-def get_embedding(text):
-    response = openai.Embedding.create(input=text, model="text-embedding-ada-002")
-    return response['data'][0]['embedding']
-
-def message_to_dict(msg: BaseMessage):
+# 일정 생성 후 메모/답변 문구 생성에 쓰는 공통 마감 시간(초)
+SAVE_PLANS_DEADLINE_SECONDS = get_setting("SAVE_PLANS_DEADLINE_SECONDS", 30)
+
+# 일정 완성 답변 생성 방식: "template"(로컬 템플릿) 또는 "llm"(Gemini)
+NARRATIVE_MODE = get_setting("NARRATIVE_MODE", "template")
+
+# 스트리밍이 아닌 요청에서 일정 생성을 백그라운드 작업으로 넘길지 여부 (결과는 /jobs/{jobId}로 조회)
+SAVE_PLANS_AS_JOB = get_setting("SAVE_PLANS_AS_JOB", True)
+
+# 검색 결과/일정을 프롬프트(대화 메모리 포함)에 넣을 때 쓰는 압축 표의 열
+SEARCH_MEMORY_COLUMNS = ["title", "rating", "price", "type", "description"]
+PLAN_PROMPT_COLUMNS = ["date", "time", "title", "place", "address", "description"]
+
+# GPT-4o 함수 라우터에 제공하는 함수 목록
+ROUTER_FUNCTIONS = [
+    {
+        "name": "search_places",
+        "description": "Search for various types of places based on user query, such as 'popular cafes in Barcelona'. This function should be used for general searches where the user is looking for multiple options or recommendations.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "The search query for finding places. Include keywords like 'find', 'popular', 'recommend', 'cafes', 'restaurants', etc. If the query isn't in English, translate it to English."
+                }
+            },
+            "required": ["query"]
+        }
+    },
+    {
+        "name": "just_chat",
+        "description": "Respond to general questions and provide information",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "The user's general query"
+                }
+            },
+            "required": ["query"]
+        }
+    },
+    {
+        "name": "save_place",
+        "description": "사용자의 query에서 숫자가 있다면 숫자를 추출하여 SerpData의 MongoDB 데이터를 SavePlace MongoDB에 저장합니다. 사용자가 숫자와 함께, 또는 숫자 없이 '저장', '추가', '갈래' 등의 다양한 표현으로 저장을 요청할 수 있습니다.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "사용자가 숫자와 함께 또는 숫자 없이 저장 또는 추가를 요청하는 다양한 표현의 쿼리 문자열"
+                }
+            },
+            "required": ["query"]
+        }
+    },
+    {
+        "name": "save_plan",
+        "description": "SavePlace의 placeData를 mysql tripPlans Table에 저장",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "사용자가 여행 계획 짜줘, 여행 일정 만들어줘, 최종 일정 만들어줘, 그걸로 일정 짜줘 등 여행 관련 일정을 만들어달라는 요청하는 모든 말을 했을 때 실행"
+                }
+            },
+            "required": ["query"]
+        }
+    },
+    {
+        "name": "update_trip_plan",
+        "description": "Update a trip plan with the given details",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "사용자가 일정을 수정하고 싶다는 내용을 담은 문자열"
+                },
+                "userId": {
+                    "type": "string",
+                    "description": "The user ID for the search context"
+                },
+                "tripId": {
+                    "type": "string",
+                    "description": "The trip ID for the search context"
+                }
+            },
+            "required": ["query", "userId", "tripId"]
+        }
+    },
+    {
+        "name": "search_place_details",
+        "description": "Fetch detailed information about a specific place based on the place name. This function should be used when the user provides a specific place name and wants detailed information about it.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "The name of the place to get details for. If the query isn't english, translate it in english."
+                }
+            },
+            "required": ["query"]
+        }
+    }
+]
 
-    if isinstance(msg, HumanMessage):
-        return {"role": "user", "content": msg.content}
-    elif isinstance(msg, AIMessage):
-        return {"role": "assistant", "content": msg.content}
-    elif isinstance(msg, SystemMessage):
-        return {"role": "system", "content": msg.content}
-    else:
-        raise ValueError(f"Unknown message type: {type(msg)}")
+async def emit_event(emit, event, data):
+    # 스트리밍 요청일 때만 단계별 이벤트 전달
+    if emit is not None:
+        await emit(event, data)
 
-def call_openai_function(query: str, userId: str, tripId: str, latitude: Optional[float] = None, longitude: Optional[float] = None, personality: Optional[str] = None):
+async def call_openai_function(query: str, userId: str, tripId: str, latitude: Optional[float] = None, longitude: Optional[float] = None, personality: Optional[str] = None, emit=None):
     isSerp = False
     geo_coordinates = []
     function_name = None
+    memory_result = None
+    jobId = None
+    # 라우팅 전까지의 호출은 router로, 이후는 선택된 함수 이름으로 집계
+    set_function_name("router")
+    memory = memory_store.get(userId, tripId)
     
     if query.strip().lower() == "확인":
         result = update_trip_plan_confirmed(userId)
-        memory.save_context({"input": query}, {"output": result})
+        memory.save_context(query, result)
+        memory_store.save(memory)
         return {"result": result, "geo_coordinates": geo_coordinates, "isSerp": isSerp, "function_name": "update_trip_plan_confirmed"}
 
     if userId in pending_updates and query.strip().lower() != "확인":
         pending_updates.pop(userId)
         result = "일정 수정을 취소합니다! 수정을 원하시면 다시 수정사항을 말씀해주세요!"
-        memory.save_context({"input": query}, {"output": result})
+        memory.save_context(query, result)
+        memory_store.save(memory)
         return {"result": result, "geo_coordinates": geo_coordinates, "isSerp": isSerp, "function_name": "cancel_update"}
 
-    memory.save_context({"input": query}, {"output": ""})
-    print(memory.chat_memory)
+    history, _ = memory.build_prompt_messages()
     
     messages = [
         {"role": "system", "content": "You are a helpful assistant that helps users plan their travel plans."},
-    ] + [message_to_dict(msg) for msg in memory.chat_memory.messages] + [
+    ] + history + [
         {"role": "user", "content": query}
     ]
     
-    response = openai.ChatCompletion.create(
-        model="gpt-4o",
-        messages=messages,
-        functions=[
-            {
-                "name": "search_places",
-                "description": "Search for various types of places based on user query, such as 'popular cafes in Barcelona'. This function should be used for general searches where the user is looking for multiple options or recommendations.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "The search query for finding places. Include keywords like 'find', 'popular', 'recommend', 'cafes', 'restaurants', etc. If the query isn't in English, translate it to English."
-                        }
-                    },
-                    "required": ["query"]
-                }
-            },
-            {
-                "name": "just_chat",
-                "description": "Respond to general questions and provide information",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "The user's general query"
-                        }
-                    },
-                    "required": ["query"]
-                }
-            },
-            {
-                "name": "save_place",
-                "description": "사용자의 query에서 숫자가 있다면 숫자를 추출하여 SerpData의 MongoDB 데이터를 SavePlace MongoDB에 저장합니다. 사용자가 숫자와 함께, 또는 숫자 없이 '저장', '추가', '갈래' 등의 다양한 표현으로 저장을 요청할 수 있습니다.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "사용자가 숫자와 함께 또는 숫자 없이 저장 또는 추가를 요청하는 다양한 표현의 쿼리 문자열"
-                        }
-                    },
-                    "required": ["query"]
-                }
-            },
-            {
-                "name": "save_plan",
-                "description": "SavePlace의 placeData를 mysql tripPlans Table에 저장",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "사용자가 여행 계획 짜줘, 여행 일정 만들어줘, 최종 일정 만들어줘, 그걸로 일정 짜줘 등 여행 관련 일정을 만들어달라는 요청하는 모든 말을 했을 때 실행"
-                        }
-                    },
-                    "required": ["query"]
-                }
-            },
-            {
-                "name": "update_trip_plan",
-                "description": "Update a trip plan with the given details",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "사용자가 일정을 수정하고 싶다는 내용을 담은 문자열"
-                        },
-                        "userId": {
-                            "type": "string",
-                            "description": "The user ID for the search context"
-                        },
-                        "tripId": {
-                            "type": "string",
-                            "description": "The trip ID for the search context"
-                        }
-                    },
-                    "required": ["query", "userId", "tripId"]
-                }
-            },
-            {
-                "name": "search_place_details",
-                "description": "Fetch detailed information about a specific place based on the place name. This function should be used when the user provides a specific place name and wants detailed information about it.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "The name of the place to get details for. If the query isn't english, translate it in english."
-                        }
-                    },
-                    "required": ["query"]
-                }
-            }
-        ],
-        function_call="auto"
-    )
+    # 규칙으로 확실하게 분류되는 요청은 GPT-4o 라우터를 건너뛰고 바로 처리
+    response = None
+    fast_intent = classify_intent(query)
+    if fast_intent:
+        function_call = {"name": fast_intent, "arguments": json.dumps({"query": query}, ensure_ascii=False)}
+    else:
+        started = time.perf_counter()
+        response = await chat_completion(
+            messages=messages,
+            functions=ROUTER_FUNCTIONS,
+            function_call="auto"
+        )
+        record_router_latency(time.perf_counter() - started)
 
     try:
-        function_call = response.choices[0].message["function_call"]
+        if response is not None:
+            function_call = response.choices[0].message["function_call"]
         function_name = function_call["name"]
+        set_function_name(function_name)
 
         # 호출된 함수 이름을 출력
-        print(f"Calling function: {function_name}")
+        print(f"Calling function: {function_name}" + (" (rule)" if fast_intent else ""))
+        await emit_event(emit, "routing", {"function_name": function_name})
 
         if function_name == "search_places":
             args = json.loads(function_call["arguments"])
             search_query = args["query"]
 
-            result, geo_coordinates = search_places(search_query, userId, tripId, latitude, longitude, personality)
+            result, geo_coordinates, memory_result = await search_places(search_query, userId, tripId, latitude, longitude, personality, emit=emit)
             isSerp = True
 
         elif function_name == "search_place_details":
             args = json.loads(function_call["arguments"])
             search_query = args["query"]
             
-            result, geo_coordinates = search_place_details(search_query, userId, tripId, latitude, longitude)
+            result, geo_coordinates = await search_place_details(search_query, userId, tripId, latitude, longitude)
             isSerp = True
         elif function_name == "just_chat":
             args = json.loads(function_call["arguments"])
-            result = just_chat(args["query"])
+            result = await just_chat(args["query"], emit=emit)
         elif function_name == "save_place":
             args = json.loads(function_call["arguments"])
             result = savePlace(args["query"], userId, tripId)
         elif function_name == "save_plan":
             args = json.loads(function_call["arguments"])
-            result = savePlans(userId, tripId)
+            if emit is None and SAVE_PLANS_AS_JOB:
+                jobId = await job_queue.enqueue("save_plans", {"userId": userId, "tripId": tripId})
+                result = "여행 일정을 만들고 있어요⏳ 완성되면 바로 보여드릴게요!"
+            else:
+                result = await savePlans(userId, tripId, emit=emit)
         elif function_name == "update_trip_plan":
             args = json.loads(function_call["arguments"])
-            result = handle_update_trip_plan(args["query"], userId, tripId)
+            result = await handle_update_trip_plan(args["query"], userId, tripId)
         else:
             result = response.choices[0].message["content"]
     except KeyError:
+        if response is None:
+            raise
         result = response.choices[0].message["content"]
 
-    # 대화 메모리에 응답 추가
-    memory.save_context({"input": query}, {"output": result})
+    # 대화 메모리에 응답 추가 (검색 결과는 이후 라우터 프롬프트에 계속 들어가므로 압축 표로 저장)
+    memory.save_context(query, memory_result or result)
+    memory_store.save(memory)
+    memory_store.schedule_summary(memory)
 
     return {"result" : result, 
             "geo_coordinates": geo_coordinates, 
             "isSerp": isSerp, 
-            "function_name": function_name}
+            "function_name": function_name,
+            "tokens_saved": tokens_saved,
+            "jobId": jobId}
 
 
-def search_places(query: str, userId: str, tripId: str, latitude: float, longitude: float, personality: str):
+async def search_places(query: str, userId: str, tripId: str, latitude: float, longitude: float, personality: str, emit=None):
     
-    # JSON 문자열을 파이썬 딕셔너리로 변환
-    try:
-        # JSON 문자열을 파이썬 딕셔너리로 변환
-        personality = json.loads(personality)
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")  # JSON 디코딩 에러가 발생한 경우 출력
-    except Exception as e:
-        print(f"Unexpected error: {e}")  # 예상치 못한 에러가 발생한 경우 출력
-    
-    # Google Search API를 사용하여 장소 검색
-    # ll 파라미터 설정
-    ll_param = f"@{latitude},{longitude},14z"
-    params = {
-        "engine": "google_maps",
-        "q": query,
-        "hl": "en",
-        "api_key": SERP_API_KEY,
-        "ll": ll_param
-    }
-    search = GoogleSearch(params)
-    data = search.get_dict()
-    
-    personality_dict = {
-        "money1": "이왕 여행을 간 김에 가격이 비싸고 좋은 곳으로 알려줘",
-        "money2": "여행 경비를 아껴야해 가격이 저렴한 곳으로 알려줘",
-        "food1": "맛집 웨이팅 기다릴 수 있어 평점이 높은 곳 위주로",
-        "food2": "그냥 끌리는대로 다닐래 평점 낮아도 상관 없어",
-        "transport1": "경도 위도가 가까운 곳으로 알려줘",
-        "transport2": "좀 멀어도 괜찮아",
-        "schedule1": "즐기면서 천천히 다니고 싶어",
-        "schedule2": "일정 알차게 돌아다니고 싶어",
-        "photo1": "사진은 중요하지 않아",
-        "photo2": "포토스팟 위주로 알려줘"
-    }
-
-    personality_query = "사용자의 성향: "
-    for key, value in personality.items():
-        personality_query += personality_dict[value] + " "
+    # Google Search API를 사용하여 장소 검색 (같은 지역의 같은 검색어는 캐시 사용)
+    data = await serp_search(query, latitude, longitude, engine="google_maps", hl="en")
     
     parsed_results = []
     serp_collection = db['SerpData']
     serp_collection.delete_one({"userId": userId, "tripId": tripId})
-    translator = GoogleTranslator(source='en', target='ko')
+    
+    # 좌표/주소가 없는 결과는 제외하고, 설명은 한 번에 모아서 번역
+    local_results = [
+        result for result in data.get('local_results', [])
+        if result.get('address') and result.get('gps_coordinates', {}).get('latitude') and result.get('gps_coordinates', {}).get('longitude')
+    ]
+    translated_descriptions = await translate_batch(
+        [result.get('description', 'No description available.') for result in local_results],
+        source='en', target='ko'
+    )
     
     # 결과 파싱
-    for result in data['local_results']:
-        title = result.get('title')
-        rating = result.get('rating')
-        address = result.get('address')
+    for result, translated_description in zip(local_results, translated_descriptions):
         gps_coordinates = result.get('gps_coordinates', {})
-        latitude = gps_coordinates.get('latitude')
-        longitude = gps_coordinates.get('longitude')
-        description = result.get('description', 'No description available.')
-        translated_description = translator.translate(description)
-        price = result.get('price', None)
-
-        if not address or not latitude or not longitude:
-            continue
 
         place_data = {
-            "title": title,
-            "rating": rating,
-            "address": address,
-            "latitude": latitude,
-            "longitude": longitude,
+            "title": result.get('title'),
+            "rating": result.get('rating'),
+            "address": result.get('address'),
+            "latitude": gps_coordinates.get('latitude'),
+            "longitude": gps_coordinates.get('longitude'),
             "description": translated_description,
-            "price": price,
+            "price": result.get('price', None),
+            "type": result.get('type'),
             "date": None,
             "time": None
         }
         parsed_results.append(place_data)
+    await emit_event(emit, "places", {"places": parsed_results})
 
-    # Gemini API를 사용하여 정렬
-    genai.configure(api_key=GEMINI_API_KEY)
-    prompt = (personality_query + "\n"
-              "장소 목록:\n" +
-              '\n'.join([f"{i+1}. 장소 이름: {place['title']}\n    별점: {place['rating']}\n    주소: {place['address']}\n    설명: {place['description']}\n    가격: {place.get('price', '없음')}\n" 
-                         for i, place in enumerate(parsed_results)]) + "\n"
-              "위 성향에 맞게 장소 목록을 재정렬해주세요. 해당 성향에 적합한 장소를 먼저 정렬해주세요 모든 장소를 사용해야하고 중복되지 않게 해주세요 이 장소 말고 다른 장소는 추가해서 안돼")
-    
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    response = model.generate_content(prompt).text
-    
-    # 응답에서 정렬된 장소 목록 추출
-    sorted_results = response.strip().split('\n')
-    
-    # parsed_results를 sorted_results 순서에 맞게 정렬
-    sorted_parsed_results = []
-    for result in sorted_results:
-        for place in parsed_results:
-            if place['title'] in result:
-                sorted_parsed_results.append(place)
-                break
+    # 사용자 성향(가격, 평점, 거리, 포토스팟)에 맞게 로컬에서 정렬
+    try:
+        sorted_parsed_results = await rank_places_async(parsed_results, personality, latitude, longitude)
+    except Exception as e:
+        # 정렬에 실패해도 검색 결과는 원래 순서로 보여준다
+        print(f"Place ranking failed, returning unranked places: {e}")
+        sorted_parsed_results = parsed_results
+    await emit_event(emit, "ranked_places", {"places": sorted_parsed_results})
     
     # 정렬된 결과를 MongoDB에 저장
     document = {
@@ -332,19 +318,27 @@ def search_places(query: str, userId: str, tripId: str, latitude: float, longitu
         final_formatted_results.append(formatted_place)
         geo_coordinates.append((place['latitude'], place['longitude']))
     resultFormatted = '\n'.join(final_formatted_results)
-    return resultFormatted, geo_coordinates
 
-def just_chat(query: str):
-    response = openai.ChatCompletion.create(
+    # 번호(i+1)로 저장 요청을 받을 수 있도록 순서는 그대로 두고 나머지 필드만 압축
+    table, _ = encode_rows(sorted_parsed_results, SEARCH_MEMORY_COLUMNS)
+    memory_result = f"검색 결과 ({describe_columns(SEARCH_MEMORY_COLUMNS)}, 번호는 i+1):\n{table}"
+    return resultFormatted, geo_coordinates, memory_result
 
-        model="gpt-4o",
+async def just_chat(query: str, emit=None):
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": query}
+    ]
+    if emit is None:
+        response = await chat_completion(messages=messages)
+        return response.choices[0].message["content"]
 
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": query}
-        ]
-    )
-    return response.choices[0].message["content"]
+    # 스트리밍 요청이면 생성되는 토큰을 바로 전달
+    tokens = []
+    async for token in chat_completion_stream(messages):
+        tokens.append(token)
+        await emit("token", {"text": token})
+    return "".join(tokens)
 
 def savePlace(query, userId, tripId):
     try:
@@ -388,102 +382,91 @@ def savePlace(query, userId, tripId):
     except Exception as e:
         return "잠시 오류가 있었어요😭 다시 한번 말해주세요!"
 
-def savePlans(userId, tripId):
+async def savePlans(userId, tripId, emit=None):
     session = sqldb.sessionmaker()
     # 사용자 성향 데이터 가져오기
     user_data = session.query(user).filter(user.userId == userId).first().personality
-    personality = json.loads(user_data)
-    
-    transport_preference = personality.get("transport", "")
-    schedule_preference = personality.get("schedule", "")
-
-    # 성향에 따른 설명 매핑
-    personality_dict = {
-        "transport1": "관광지들끼리 경도 위도가 가까운 곳으로 알려줘",
-        "transport2": "관광지들끼리 경도 위도가 좀 멀어도 괜찮아",
-        "schedule1": "여행 스케줄을 즐기면서 천천히 다니고 싶어",
-        "schedule2": "여행 스케줄 일정 알차게 돌아다니고 싶어"
-    }
-
-    # 사용자의 성향에 따른 query 구성
-    personality_query = f"사용자의 성향은 {personality_dict.get(transport_preference, '')}, {personality_dict.get(schedule_preference, '')}"
+    personality = parse_personality(user_data)
     
     mytrip = session.query(myTrips).filter(myTrips.tripId == tripId).first()
     startDate = mytrip.startDate
     endDate = mytrip.endDate
-    genai.configure(api_key=GEMINI_API_KEY)
+    city = mytrip.city
+    # LLM 호출 동안 DB 커넥션을 잡고 있지 않도록 조회가 끝나면 바로 반환
+    session.close()
     save_place_collection = db['SavePlace']
     document = save_place_collection.find_one({"userId": userId, "tripId": tripId})
-    if not document:
+    if not document or not document.get('placeData'):
         response = "아직 저장하신 장소들이 없어요🤔\n제가 추천해드리는 장소를 저장하시거나 가고 싶은 장소를 직접 입력해보세요!"
         return response
     place_data = document['placeData']
-    place_data_str = json.dumps(place_data, ensure_ascii=False)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    query = f"""
-    {startDate}부터 {endDate}까지 다음 장소들만 포함한 상세한 여행 일정을 만들어줘. {place_data_str} 데이터만을 모두 사용해서 모든 날짜에 관광지, 레스토랑, 카페가 균형있게 포함되게 짜주고 되도록 {personality_query} 니까 사용자의 성향에 맞춰서 짜줘. 같은 장소는 여러 일정을 만들지는 말아줘. 되도록 식사시간 그니까 12시, 6시는 식당이나 카페에 방문하게 해주고 
-    시간은 시작 시간만 HH:MM:SS 형태로 뽑아주고 날짜는 YYYY-MM-DD이렇게 뽑아줘 description 절대 생략하지 말고 다 넣어줘. title 은 장소에서 해야할 일을 알려주면 좋겠다 예를 들어 에펠탑 관광 이런식으로 뽑아줘.
-
-    일정에 들어가야하는 정보는 다음과 같은 포맷으로 만들어줘: title: [title], date: [YYYY-MM-DD], time: [HH:MM:SS], place: [place], address: [address], latitude: [latitude], longitude: [longitude], description: [description].의 json배열로 뽑아줘
-    date랑 time이 null이 아니라면 그 시간으로 일정을 짜줘. startDate 부터 endDate까지 스케줄이 있어야해 다른 장소는 일정 만들 때 사용하지마 절대 내가 넣은 데이터만 사용해야해
-
-    """
-    response = model.generate_content(query)
-    print(response.text)
-    cleaned_string = response.text.strip('```')
-    cleaned_string= cleaned_string.replace('json', '').strip()
-    
-    datas = json.loads(cleaned_string)
-    
-
-    for data in datas:
-        new_trip = tripPlans(
-            planId= str(uuid.uuid4()),
-            userId= userId,
-            tripId= tripId,
-            title=data['title'],
-            date=data['date'],
-            time=data['time'],
-            place=data['place'],
-            address=data['address'],
-            latitude=data['latitude'],
-            longitude=data['longitude'],
-            description=data['description']
-        )
-        session.add(new_trip)
-    
-    session.commit()
 
-    # 저장한 계획들로 ai가 계획 별 메모 만들어주
+    # 날짜/시간 배정은 로컬 엔진이 하고(지역별 묶음, 식사 시간), LLM은 제목과 설명만 작성
+    plans, skipped = solve_itinerary(place_data, startDate, endDate, personality)
+    if not plans:
+        # 좌표가 없는 장소뿐인 경우 등: 메모/일정/저장 장소를 건드리지 않고 그대로 안내
+        return "저장하신 장소들의 위치 정보를 찾지 못해서 일정을 만들 수 없었어요🤔\n장소를 검색해서 다시 저장한 뒤 일정을 만들어 달라고 말씀해주세요!"
+    # 스트리밍 응답에서는 제목/설명이 완성된 날짜부터 하루치씩 먼저 보냄 (DB 저장은 아래에서 한 번에)
+    async def on_day(date, day_plans):
+        day_datas = [{key: value for key, value in plan.items() if not key.startswith('_')} for plan in day_plans]
+        await emit_event(emit, "plans_day", {"date": date, "plans": day_datas})
+    plans = await write_plan_texts(plans, on_day=on_day if emit is not None else None)
+    datas = [{key: value for key, value in plan.items() if not key.startswith('_')} for plan in plans]
+
+    # 계획 별 AI 메모와 (llm 모드일 때) 챗봇 답변 문구는 서로 독립적이라 동시에 생성 (공통 마감 시간, 실패한 쪽은 건너뜀)
     places = [data['place'] for data in datas]
-    ai_memo = openaiPlanMemo(places, GEMINI_API_KEY)
-
-    mytrip = session.query(myTrips).filter(myTrips.tripId == tripId).first()
-    mytrip.memo = ai_memo
-    session.commit()
-
-    save_place_collection.delete_one({"userId": userId, "tripId": tripId})
-    session.close()
-
-    query = f"""
-    {cleaned_string}이걸 상세하게 설명해서 답변해줘 챗봇이 일정을 만들어준 것처럼 예를 들어 바르셀로나 여행 일정을 완성했어요! 1일차 - 이런식으로
-    """
-    response = model.generate_content(query).text.replace('*', '')
+    generations = {"memo": openaiPlanMemo(places)}
+    if NARRATIVE_MODE == "llm":
+        plan_table, _ = encode_rows(datas, PLAN_PROMPT_COLUMNS, index=False)
+        narrative_query = f"""
+        일정 표({describe_columns(PLAN_PROMPT_COLUMNS)}):
+        {plan_table}
+        이걸 상세하게 설명해서 답변해줘 챗봇이 일정을 만들어준 것처럼 예를 들어 바르셀로나 여행 일정을 완성했어요! 1일차 - 이런식으로
+        """
+        generations["narrative"] = gemini_generate(narrative_query)
+    results, errors = await gather_with_deadline(generations, timeout=SAVE_PLANS_DEADLINE_SECONDS)
+    if errors:
+        print(f"savePlans partial results: {errors}")
+
+    # 일정과 메모를 한 트랜잭션으로 저장하고, 커밋이 성공한 뒤에만 SavePlace 삭제 (메모가 없으면 기존 메모 유지)
+    session = sqldb.sessionmaker()
+    try:
+        insert_trip_plans_bulk(session, userId, tripId, datas, memo=results["memo"])
+    finally:
+        session.close()
+    # 일정이 가득 차서 넣지 못한 장소는 SavePlace에 남겨둔다
+    if skipped:
+        clear_saved_places(userId, tripId, places=[data['place'] for data in datas])
+    else:
+        clear_saved_places(userId, tripId)
 
+    # 기본은 템플릿으로 답변을 만들고, llm 모드에서 생성에 실패했을 때도 템플릿 사용
+    if results.get("narrative") is None:
+        response = render_itinerary(plans, city)
+    else:
+        response = results["narrative"].replace('*', '')
+    if skipped:
+        titles = ", ".join(str(place.get("title")) for place in skipped)
+        response += f"\n\n일정이 가득 차서 {titles}은(는) 넣지 못했어요. 저장 목록에 남겨둘게요!"
     return response
 
-def handle_update_trip_plan(query, userId, tripId):
+async def run_save_plans_job(payload):
+    # 백그라운드 일정 생성: 완성된 답변을 대화 메모리에도 이어서 남긴다
+    result = await savePlans(payload["userId"], payload["tripId"])
+    memory = memory_store.get(payload["userId"], payload["tripId"])
+    memory.add_message("assistant", result)
+    memory_store.save(memory)
+    return result
+
+async def handle_update_trip_plan(query, userId, tripId):
     session = sqldb.sessionmaker()
     plans = session.query(tripPlans).filter_by(userId=userId, tripId=tripId).all()
+    if not plans:
+        session.close()
+        return "수정할 일정이 없어요🤔 먼저 여행 일정을 만들어주세요!"
     
-    plan_texts = [f"{plan.title} {plan.date} {plan.time} {plan.place} {plan.address} {plan.description}" for plan in plans]
-    plan_embeddings = [get_embedding(text) for text in plan_texts]
-    
-    query_embedding = get_embedding(query)
-    similarities = [cosine_similarity([query_embedding], [embedding])[0][0] for embedding in plan_embeddings]
-    
-    most_similar_index = similarities.index(max(similarities))
-    most_similar_plan = plans[most_similar_index]
+    # 여행별 벡터 인덱스에서 질의문과 가장 유사한 일정 검색 (바뀐 일정만 다시 임베딩)
+    most_similar_plan, _ = (await find_similar_plans(plans, query, tripId, k=1))[0]
     
     extracted_info = extract_info_from_query(query)
     
@@ -598,6 +581,7 @@ def update_trip_plan(userId: str, tripId: str, date: str, title: str, newTitle:
             plan.date = newDate
             plan.time = newTime
             session.commit()
+            invalidate_plan_embeddings([plan.planId])
 
             updated_plan = {
                 "title": plan.title,
@@ -634,22 +618,22 @@ def update_trip_plan(userId: str, tripId: str, date: str, title: str, newTitle:
         session.close()
 
 # 사용자 입력 버튼용 (특정 장소명에 대한 정보를 serp에서 불러오기)
-def search_place_details(query: str, userId: str, tripId: str, latitude: float, longitude: float):
-    ll_param = f"@{latitude},{longitude},14z"
-    params = {
-        "engine": "google_maps",
-        "q": query,
-        "hl": "en",
-        "api_key": SERP_API_KEY,
-        "ll": ll_param
-    }
-    search = GoogleSearch(params)
-    data = search.get_dict()
-    
-    translator = GoogleTranslator(source='en', target='ko')
+# 같은 장소를 같은 지역에서 동시에 찾으면 검색/번역은 한 번만 수행 (사용자별 저장은 각자 처리)
+@single_flight("place_details", key=lambda query, latitude, longitude: (normalize_query(query), quantize(latitude), quantize(longitude)))
+async def fetch_place_details(query, latitude, longitude):
+    # (place_results, 번역한 설명), 찾지 못하면 (None, None)
+    data = await serp_search(query, latitude, longitude, engine="google_maps", hl="en")
     result = data.get('place_results', {})
+    gps_coordinates = result.get('gps_coordinates', {})
+    if not result or not result.get('address') or not gps_coordinates.get('latitude') or not gps_coordinates.get('longitude'):
+        return None, None
+    translated_description = await translate(result.get('description', 'No description available.'), source='en', target='ko')
+    return result, translated_description
+
+async def search_place_details(query: str, userId: str, tripId: str, latitude: float, longitude: float):
+    result, translated_description = await fetch_place_details(query, latitude, longitude)
     
-    # place_results가 비어 있을 경우 처리
+    # place_results가 비어 있거나 주소/좌표가 없을 경우 처리
     if not result:
         return "입력하신 장소를 찾을 수 없습니다😱\n정확한 장소명으로 다시 입력해주세요!", []
     
@@ -662,12 +646,7 @@ def search_place_details(query: str, userId: str, tripId: str, latitude: float,
     gps_coordinates = result.get('gps_coordinates', {})
     latitude = gps_coordinates.get('latitude')
     longitude = gps_coordinates.get('longitude')
-    description = result.get('description', 'No description available.')
-    translated_description = translator.translate(description)
     price = result.get('price', None)
-
-    if not address or not latitude or not longitude:
-        return "입력하신 장소를 찾을 수 없습니다😱\n정확한 장소명으로 다시 입력해주세요!"
     
     geo_coordinates = [(latitude, longitude)]
     
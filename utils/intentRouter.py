@@ -0,0 +1,81 @@
+import re
+
+# GPT-4o 함수 라우터 앞단의 규칙 기반 의도 분류
+# 키워드/정규식 점수로 확실한 요청만 바로 처리하고, 애매하면 None을 반환해서 LLM 라우터로 넘긴다
+
+INTENT_THRESHOLD = 2.0
+INTENT_MARGIN = 1.0
+
+# (의도, 정규식, 점수)
+INTENT_RULES = [
+    ("save_place", re.compile(r"저장|추가|담아|넣어|갈래|찜"), 1.5),
+    ("save_place", re.compile(r"\d+\s*(번|번째)"), 1.0),
+    ("save_plan", re.compile(r"(여행|최종)?\s*(일정|계획|플랜|스케줄)\s*(을|를|좀|으로|로)?\s*(만들|짜|생성|완성|구성)"), 3.0),
+    ("save_plan", re.compile(r"(그걸로|이걸로|저장한\s*(곳|장소)(들)?\s*(으로|로))\s*.*(짜|만들)"), 2.0),
+    ("update_trip_plan", re.compile(r"(일정|시간|날짜|\d{1,2}\s*시)\s*.*(바꿔|변경|수정|옮겨|미뤄|당겨)"), 3.0),
+    ("update_trip_plan", re.compile(r"\d{1,2}\s*시(\s*\d{1,2}\s*분)?\s*(으로|로)"), 1.0),
+    ("update_trip_plan", re.compile(r"\d{4}-\d{2}-\d{2}|\d{1,2}\s*월\s*\d{1,2}\s*일"), 0.5),
+]
+
+# 이 표현이 있으면 검색/질문일 가능성이 높아 규칙 점수를 깎는다
+NEGATIVE_RULES = [
+    (re.compile(r"추천|찾아|알려|어디|뭐|어떻게|왜|\?"), 1.5),
+    (re.compile(r"려면|할까|짤까|만들까|좋아|며칠"), 1.5),
+]
+
+# 일정을 확정하거나 바꾸는 의도는 데이터를 지우거나 덮어쓰므로 명령형으로 끝나는 요청만 규칙으로 처리
+DESTRUCTIVE_INTENTS = {"save_plan", "update_trip_plan"}
+IMPERATIVE_ENDING = re.compile(r"(줘|줘요|주세요|주라|해|해요|해라|하자|짜|바꿔|옮겨|미뤄|당겨|만들어|부탁해|부탁해요|부탁드려요)[\s.!~]*$")
+
+intent_counters = {
+    "requests": 0,
+    "fallbacks": 0,
+    "hits": {"save_place": 0, "save_plan": 0, "update_trip_plan": 0},
+    "router_calls": 0,
+    "router_latency_avg": 0.0,
+    "latency_saved_seconds": 0.0
+}
+
+def score_intents(query):
+    scores = {}
+    for intent, pattern, weight in INTENT_RULES:
+        if pattern.search(query):
+            scores[intent] = scores.get(intent, 0.0) + weight
+    penalty = sum(weight for pattern, weight in NEGATIVE_RULES if pattern.search(query))
+    return {intent: score - penalty for intent, score in scores.items()}
+
+def classify_intent(query):
+    # 확신할 수 있을 때만 의도 이름 반환
+    intent_counters["requests"] += 1
+    query = query.strip()
+    scores = score_intents(query)
+    ranked = sorted(scores.items(), key=lambda item: -item[1])
+    if ranked and ranked[0][1] >= INTENT_THRESHOLD:
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        intent = ranked[0][0]
+        allowed = intent not in DESTRUCTIVE_INTENTS or IMPERATIVE_ENDING.search(query) is not None
+        if ranked[0][1] - runner_up >= INTENT_MARGIN and allowed:
+            intent_counters["hits"][intent] += 1
+            # LLM 라우터를 건너뛴 만큼 평균 라우팅 시간을 절약한 것으로 기록
+            intent_counters["latency_saved_seconds"] += intent_counters["router_latency_avg"]
+            return intent
+    intent_counters["fallbacks"] += 1
+    return None
+
+def record_router_latency(seconds):
+    # LLM 라우터 호출 시간의 이동 평균
+    intent_counters["router_calls"] += 1
+    if intent_counters["router_calls"] == 1:
+        intent_counters["router_latency_avg"] = seconds
+    else:
+        intent_counters["router_latency_avg"] = 0.9 * intent_counters["router_latency_avg"] + 0.1 * seconds
+
+def intent_stats():
+    requests = intent_counters["requests"]
+    return {
+        **intent_counters,
+        "hits": dict(intent_counters["hits"]),
+        "hit_rates": {intent: round(count / requests, 4) if requests else 0.0 for intent, count in intent_counters["hits"].items()},
+        "router_latency_avg": round(intent_counters["router_latency_avg"], 4),
+        "latency_saved_seconds": round(intent_counters["latency_saved_seconds"], 4)
+    }
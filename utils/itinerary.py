@@ -0,0 +1,339 @@
+import datetime
+import math
+import re
+import numpy as np
+
+# 저장한 장소들로 여행 일정을 만드는 로컬 엔진
+# 위경도로 장소를 여행 일수만큼 균형 있게 묶고(k-means), 하루 안에서는 가까운 순서로 시간대를 배정한다
+# 식당/카페는 12:00, 18:00 식사 시간에 우선 배치하고, 미리 정해진 date/time은 그대로 지킨다
+# 하루에 넣을 수 있는 장소 수는 성향별 페이스(시작/끝 시각, 장소당 시간)로 정해지고,
+# 넘치는 장소는 자리가 남는 날로 옮기며 그래도 자리가 없으면 일정에 넣지 않고 따로 돌려준다
+# LLM으로 일정 제목과 설명 문구를 쓰는 부분은 planText에서 처리
+
+MEAL_SLOTS = ["12:00:00", "18:00:00"]
+
+# 일정 스타일별 하루 페이스: 첫 일정 시각, 마지막 일정 시각, 장소 하나에 쓰는 시간(분, 이동 포함)
+PACE_PROFILES = {
+    "schedule1": {"day_start": "10:00", "day_end": "18:00", "slot_minutes": 150},  # 여유롭게
+    "schedule2": {"day_start": "08:30", "day_end": "21:00", "slot_minutes": 90}    # 알차게
+}
+DEFAULT_PACE = {"day_start": "09:30", "day_end": "20:00", "slot_minutes": 120}
+
+# 이동 성향별 장소당 시간 보정(분): transport1(가까운 곳 위주)은 이동이 짧고 transport2(멀어도 괜찮음)는 길다
+TRANSPORT_SLOT_ADJUST = {"transport1": -15, "transport2": 30}
+
+# 식사 시간, 미리 정해진 시간과 이 간격(분) 안에 겹치는 시간대는 사용하지 않음
+SLOT_CONFLICT_MINUTES = 60
+
+KMEANS_ITERATIONS = 20
+
+# SerpAPI 장소 type(예: "Tapas bar", "Tea house")에서 찾는 단어
+MEAL_TYPE_KEYWORDS = (
+    "restaurant", "cafe", "café", "coffee", "bakery", "bistro", "brunch", "diner", "tapas", "pizza",
+    "bar", "pub", "food", "eatery", "dessert", "tea"
+)
+# type이 없을 때 제목에서 찾는 단어 ("Barcelona"의 bar, "Teatre"의 tea처럼 헷갈리는 짧은 단어는 제외)
+MEAL_TITLE_KEYWORDS = (
+    "restaurant", "cafe", "café", "coffee", "bakery", "bistro", "brunch", "diner", "tapas", "pizzeria",
+    "eatery", "dessert"
+)
+# 한국어는 붙여 쓰는 경우가 많아 단어 경계 없이 찾음
+MEAL_KOREAN_KEYWORDS = ("식당", "카페", "레스토랑", "맛집", "음식점", "베이커리", "커피", "브런치", "디저트")
+
+MEAL_TYPE_PATTERN = re.compile(r"\b(?:" + "|".join(MEAL_TYPE_KEYWORDS) + r")s?\b")
+MEAL_TITLE_PATTERN = re.compile(r"\b(?:" + "|".join(MEAL_TITLE_KEYWORDS) + r")s?\b")
+
+def parse_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+def normalize_time(value):
+    # "9:00", "09:00", "09:00:00" -> "HH:MM:SS", 해석할 수 없으면 None
+    if not value:
+        return None
+    match = re.match(r"^\s*(\d{1,2}):(\d{2})(?::(\d{2}))?", str(value))
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}:00"
+
+def to_minutes(time_str):
+    hour, minute = time_str.split(":")[:2]
+    return int(hour) * 60 + int(minute)
+
+def from_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+def is_meal_place(place):
+    # SerpAPI type이 있으면 type으로만 판단하고, 없으면 제목에서 확실한 단어만 단어 단위로 찾는다
+    place_type = str(place.get("type") or "").lower()
+    if place_type:
+        return bool(MEAL_TYPE_PATTERN.search(place_type)) or any(keyword in place_type for keyword in MEAL_KOREAN_KEYWORDS)
+    title = str(place.get("title") or "").lower()
+    return bool(MEAL_TITLE_PATTERN.search(title)) or any(keyword in title for keyword in MEAL_KOREAN_KEYWORDS)
+
+def _project(places):
+    # 위경도를 평면 좌표(km 근사)로 변환
+    coords = np.array([[float(place["latitude"]), float(place["longitude"])] for place in places], dtype=np.float64)
+    if len(coords) == 0:
+        return coords
+    lat0 = math.radians(coords[:, 0].mean())
+    return np.column_stack([coords[:, 0] * 111.0, coords[:, 1] * 111.0 * math.cos(lat0)])
+
+def balanced_kmeans(points, k, capacities):
+    # capacities[i]: i번째 묶음에 넣을 수 있는 최대 개수 (합계는 점 개수 이상)
+    n = len(points)
+    if n == 0:
+        return np.array([], dtype=int)
+    k = min(k, n)
+
+    # 결정적인 초기화: 중심에서 가장 먼 점부터 시작하는 farthest-point 방식
+    centroids = [points[np.argmax(((points - points.mean(axis=0)) ** 2).sum(axis=1))]]
+    for _ in range(1, k):
+        distances = np.min([((points - c) ** 2).sum(axis=1) for c in centroids], axis=0)
+        centroids.append(points[np.argmax(distances)])
+    centroids = np.array(centroids)
+
+    labels = np.zeros(n, dtype=int)
+    for _ in range(KMEANS_ITERATIONS):
+        distances = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        # 가장 가까운 묶음과 두 번째 묶음의 거리 차이가 큰 점부터 배정해서 용량 제한으로 인한 손해를 줄인다
+        sorted_distances = np.sort(distances, axis=1)
+        regret = sorted_distances[:, 1] - sorted_distances[:, 0] if k > 1 else np.zeros(n)
+        order = np.argsort(-regret, kind="stable")
+        remaining = list(capacities[:k])
+        new_labels = np.zeros(n, dtype=int)
+        for i in order:
+            for cluster in np.argsort(distances[i], kind="stable"):
+                if remaining[cluster] > 0:
+                    new_labels[i] = cluster
+                    remaining[cluster] -= 1
+                    break
+        new_centroids = np.array([
+            points[new_labels == c].mean(axis=0) if np.any(new_labels == c) else centroids[c]
+            for c in range(k)
+        ])
+        if np.array_equal(new_labels, labels) and np.allclose(new_centroids, centroids):
+            break
+        labels, centroids = new_labels, new_centroids
+    return labels
+
+def nearest_neighbor_order(points, start=0):
+    n = len(points)
+    if n <= 1:
+        return list(range(n))
+    visited = [start]
+    remaining = set(range(n)) - {start}
+    while remaining:
+        last = points[visited[-1]]
+        nearest = min(remaining, key=lambda i: ((points[i] - last) ** 2).sum())
+        visited.append(nearest)
+        remaining.remove(nearest)
+    return visited
+
+def pace_profile(personality):
+    pace = dict(PACE_PROFILES.get(personality.get("schedule"), DEFAULT_PACE))
+    pace["slot_minutes"] += TRANSPORT_SLOT_ADJUST.get(personality.get("transport"), 0)
+    return pace
+
+def sight_slots_for(pace):
+    # 첫 일정 시각부터 장소당 시간 간격으로 관광 시간대를 만들고, 식사 시간과 겹치면 식사 뒤로 미룬다
+    meals = [to_minutes(slot) for slot in MEAL_SLOTS]
+    end = to_minutes(pace["day_end"])
+    slots = []
+    minutes = to_minutes(pace["day_start"])
+    while minutes <= end:
+        meal = next((m for m in meals if abs(minutes - m) < SLOT_CONFLICT_MINUTES), None)
+        if meal is not None:
+            minutes = meal + SLOT_CONFLICT_MINUTES
+            continue
+        slots.append(from_minutes(minutes))
+        minutes += pace["slot_minutes"]
+    return slots
+
+def _day_slots(sight_slots, fixed_times):
+    # 미리 정해진 시간과 겹치지 않는 관광/식사 시간대
+    fixed = [to_minutes(t) for t in fixed_times]
+    def free(slot):
+        return all(abs(to_minutes(slot) - f) >= SLOT_CONFLICT_MINUTES for f in fixed)
+    return [s for s in sight_slots if free(s)], [s for s in MEAL_SLOTS if free(s)]
+
+def _open_slot_count(day_places, sight_slots):
+    # 그날 시간이 정해지지 않은 장소에 쓸 수 있는 시간대 수
+    fixed_times = [place["_time"] for place in day_places if place["_time"]]
+    free_sights, free_meals = _day_slots(sight_slots, fixed_times)
+    return len(free_sights) + len(free_meals)
+
+def _schedule_day(day_places, points, sight_slots):
+    # 하루 일정의 시간 배정: 정해진 시간 유지 -> 식당/카페는 식사 시간 -> 나머지는 이동 순서대로 남은 시간대
+    # (시간, 장소) 목록과 시간대가 모자라 넣지 못한 장소 목록을 반환 (같은 시간대를 두 번 쓰지 않음)
+    fixed_times = [place["_time"] for place in day_places if place["_time"]]
+    free_sights, free_meals = _day_slots(sight_slots, fixed_times)
+
+    flexible = [i for i, place in enumerate(day_places) if not place["_time"]]
+    route = [flexible[i] for i in nearest_neighbor_order(points[flexible])] if flexible else []
+
+    assigned = {}
+    meals = [i for i in route if day_places[i]["_meal"]]
+    for i, slot in zip(meals, free_meals):
+        assigned[i] = slot
+    # 식사 시간대를 다 쓰고 남은 식당/카페와 관광지는 남은 시간대를 시간 순서대로 사용
+    open_slots = sorted(free_sights + free_meals[len(meals):], key=to_minutes)
+    rest = [i for i in route if i not in assigned]
+    for i, slot in zip(rest, open_slots):
+        assigned[i] = slot
+    overflow = [day_places[i] for i in rest[len(open_slots):]]
+
+    scheduled = []
+    for i, place in enumerate(day_places):
+        time = place["_time"] or assigned.get(i)
+        if time:
+            scheduled.append((time, place))
+    scheduled.sort(key=lambda item: item[0])
+    return scheduled, overflow
+
+def default_title(place):
+    if place["_meal"]:
+        return f"{place['title']}에서 식사"
+    return f"{place['title']} 관광"
+
+def solve_itinerary(place_data, startDate, endDate, personality=None):
+    # 저장된 장소 목록 -> (tripPlans 형태의 일정 dict 목록(date, time 순 정렬), 자리가 없어 넣지 못한 장소 목록)
+    personality = personality or {}
+    start = parse_date(startDate)
+    end = parse_date(endDate)
+    days = [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)] or [start]
+    day_strings = [day.isoformat() for day in days]
+
+    # 목록째로 저장된 항목이 섞여 있을 수 있어서 한 단계 펼친다
+    flat = []
+    for place in place_data:
+        flat.extend(place if isinstance(place, list) else [place])
+
+    places = []
+    seen = set()
+    for place in flat:
+        if not isinstance(place, dict) or place.get("latitude") is None or place.get("longitude") is None:
+            continue
+        # 같은 장소를 여러 번 저장했으면 한 번만 일정에 넣음
+        key = (place.get("title"), place.get("address"))
+        if key in seen:
+            continue
+        seen.add(key)
+        date = str(place.get("date"))[:10] if place.get("date") else None
+        places.append({
+            **place,
+            "_date": date if date in day_strings else None,
+            "_time": normalize_time(place.get("time")),
+            "_meal": is_meal_place(place)
+        })
+    if not places:
+        return [], []
+
+    sight_slots = sight_slots_for(pace_profile(personality))
+    points = _project(places)
+    pinned = [i for i, place in enumerate(places) if place["_date"]]
+    free = [i for i, place in enumerate(places) if not place["_date"]]
+    pinned_by_day = {day: [i for i in pinned if places[i]["_date"] == day] for day in day_strings}
+
+    # 날짜별로 남은 자리: 페이스로 정해지는 최대치(limit)와 여러 날에 고르게 나누기 위한 목표치(room)
+    limit = {}
+    for day in day_strings:
+        day_places = [places[i] for i in pinned_by_day[day]]
+        untimed = sum(1 for place in day_places if not place["_time"])
+        limit[day] = max(_open_slot_count(day_places, sight_slots) - untimed, 0)
+    target = math.ceil(len(places) / len(days))
+    room = {day: min(limit[day], max(target - len(pinned_by_day[day]), 0)) for day in day_strings}
+    # 목표치만으로 모자라면 최대치까지 앞 날짜부터 늘린다
+    shortfall = len(free) - sum(room.values())
+    for day in day_strings:
+        if shortfall <= 0:
+            break
+        extra = min(limit[day] - room[day], shortfall)
+        room[day] += extra
+        shortfall -= extra
+
+    skipped = []
+    if shortfall > 0:
+        # 모든 날이 가득 차면 나중에 저장한 장소부터 일정에서 뺀다
+        skipped = [places[i] for i in free[len(free) - shortfall:]]
+        free = free[:len(free) - shortfall]
+
+    day_of = {i: places[i]["_date"] for i in pinned}
+    if free:
+        open_days = [day for day in day_strings if room[day] > 0]
+        k = min(len(open_days), len(free))
+        # 자리가 큰 날부터 k개를 골라 묶음마다 그날의 자리를 용량으로 사용 (자리가 0인 날은 묶음을 만들지 않음)
+        capacity_days = sorted(open_days, key=lambda day: -room[day])[:k]
+        labels = balanced_kmeans(points[free], k, [room[day] for day in capacity_days])
+
+        members = {c: [free[j] for j in range(len(free)) if labels[j] == c] for c in range(k)}
+        clusters = [c for c in range(k) if members[c]]
+        cluster_centers = {c: points[members[c]].mean(axis=0) for c in clusters}
+        cluster_day = {}
+        # 미리 정해진 장소가 있는 날은 그 장소들과 가까운 묶음을 (자리가 되는 것 중에서) 먼저 배정
+        for day in day_strings:
+            anchors = pinned_by_day[day]
+            fits = [c for c in clusters if c not in cluster_day and len(members[c]) <= room[day]]
+            if not anchors or not fits:
+                continue
+            anchor = points[anchors].mean(axis=0)
+            cluster_day[min(fits, key=lambda c: ((cluster_centers[c] - anchor) ** 2).sum())] = day
+        # 나머지 묶음은 이동 순서대로 자리가 되는 빈 날짜에 배정
+        remaining = [c for c in clusters if c not in cluster_day]
+        if remaining:
+            order = nearest_neighbor_order(np.array([cluster_centers[c] for c in remaining]))
+            for c in [remaining[o] for o in order]:
+                used = set(cluster_day.values())
+                candidates = [day for day in day_strings if day not in used] or day_strings
+                fitting = [day for day in candidates if len(members[c]) <= room[day]]
+                cluster_day[c] = fitting[0] if fitting else max(candidates, key=lambda day: room[day])
+        for c in clusters:
+            for i in members[c]:
+                day_of[i] = cluster_day[c]
+        _spill(day_of, free, points, room, day_strings)
+
+    plans = []
+    for day in day_strings:
+        indexes = [i for i in range(len(places)) if day_of.get(i) == day]
+        if not indexes:
+            continue
+        day_places = [places[i] for i in indexes]
+        scheduled, overflow = _schedule_day(day_places, points[indexes], sight_slots)
+        skipped += overflow
+        for time, place in scheduled:
+            plans.append({
+                "title": default_title(place),
+                "date": day,
+                "time": time,
+                "place": place.get("title"),
+                "address": place.get("address"),
+                "latitude": place.get("latitude"),
+                "longitude": place.get("longitude"),
+                "description": (place.get("description") or "")[:255],
+                "_meal": place["_meal"]
+            })
+    return plans, [{key: value for key, value in place.items() if not key.startswith("_")} for place in skipped]
+
+def _spill(day_of, free, points, room, day_strings):
+    # 자리보다 많이 배정된 날의 장소를 그날 중심에서 먼 것부터 자리가 남는 가장 가까운 날로 옮긴다
+    def assigned(day):
+        return [i for i in free if day_of[i] == day]
+    for day in day_strings:
+        while len(assigned(day)) > room[day]:
+            spare = [other for other in day_strings if len(assigned(other)) < room[other]]
+            if not spare:
+                return
+            here = assigned(day)
+            center = points[here].mean(axis=0)
+            moving = max(here, key=lambda i: ((points[i] - center) ** 2).sum())
+            def distance(other):
+                others = assigned(other)
+                target = points[others].mean(axis=0) if others else center
+                return ((points[moving] - target) ** 2).sum()
+            day_of[moving] = min(spare, key=distance)
@@ -0,0 +1,48 @@
+import datetime
+
+# 생성된 일정을 챗봇 답변 형태의 한국어 일정 요약으로 만드는 템플릿 렌더러
+
+WEEKDAYS = ["월", "화", "수", "목", "금", "토", "일"]
+
+def format_day(date_str):
+    try:
+        day = datetime.datetime.strptime(str(date_str)[:10], "%Y-%m-%d")
+    except ValueError:
+        return str(date_str)
+    return f"{day.year}년 {day.month}월 {day.day}일 ({WEEKDAYS[day.weekday()]})"
+
+def plan_emoji(plan):
+    if plan.get("_meal"):
+        return "🍽️"
+    hour = str(plan.get("time") or "")[:2]
+    if hour.isdigit() and int(hour) >= 19:
+        return "🌙"
+    return "📌"
+
+def render_plan(plan):
+    lines = [f"{plan_emoji(plan)} {str(plan.get('time') or '')[:5]} {plan.get('title') or plan.get('place')}"]
+    if plan.get("place") and plan.get("place") not in (plan.get("title") or ""):
+        lines.append(f"    장소: {plan['place']}")
+    if plan.get("address"):
+        lines.append(f"    주소: {plan['address']}")
+    if plan.get("description"):
+        lines.append(f"    설명: {plan['description']}")
+    return "\n".join(lines)
+
+def render_day(day_number, date_str, plans):
+    header = f"📅 {day_number}일차 - {format_day(date_str)}"
+    return "\n".join([header] + [render_plan(plan) for plan in plans])
+
+def group_by_date(plans):
+    days = {}
+    for plan in plans:
+        days.setdefault(str(plan.get("date")), []).append(plan)
+    return [(date, sorted(days[date], key=lambda plan: str(plan.get("time") or ""))) for date in sorted(days)]
+
+def render_itinerary(plans, city=None):
+    title = f"{city} 여행 일정을 완성했어요!🥳" if city else "여행 일정을 완성했어요!🥳"
+    if not plans:
+        return "저장하신 장소로 일정을 만들 수 없었어요🤔 장소를 더 저장한 뒤 다시 말씀해주세요!"
+    sections = [render_day(i, date, day_plans) for i, (date, day_plans) in enumerate(group_by_date(plans), 1)]
+    footer = "일정 탭에서 시간과 장소를 확인하고 수정할 수 있어요. 즐거운 여행 되세요😊"
+    return "\n\n".join([title] + sections + [footer])
@@ -0,0 +1,253 @@
+import asyncio
+import datetime
+import random
+import time
+import uuid
+from collections import deque
+from pymongo import ReturnDocument
+from database import db, get_setting
+from utils.admission import ProviderBusy
+from utils.resilience import CircuitOpen
+from utils.tracing import set_function_name
+
+# 느린 AI 작업(배너/메모 생성, 일정 생성)을 요청과 분리해서 처리하는 백그라운드 작업 큐
+# 작업은 Jobs 컬렉션에 먼저 기록하고(서버가 재시작돼도 남도록) 프로세스 내 워커들이 순서대로 처리한다
+# 상태: queued -> running -> done / failed
+
+JOB_WORKERS = get_setting("JOB_WORKERS", 4)
+JOB_MAX_ATTEMPTS = get_setting("JOB_MAX_ATTEMPTS", 2)
+# 실패한 작업을 다시 실행하기 전 대기 시간(초): 기준 * 2^(시도 횟수 - 1)에 지터, 최대값까지
+JOB_RETRY_BACKOFF_SECONDS = get_setting("JOB_RETRY_BACKOFF_SECONDS", 5)
+JOB_RETRY_BACKOFF_MAX_SECONDS = get_setting("JOB_RETRY_BACKOFF_MAX_SECONDS", 300)
+# 실행 중인 작업은 이 주기(초)마다 heartbeatAt을 갱신한다
+JOB_HEARTBEAT_SECONDS = get_setting("JOB_HEARTBEAT_SECONDS", 30)
+# heartbeat가 이 시간(초) 넘게 끊긴 running 작업은 실행하던 프로세스가 죽은 것으로 보고 다시 처리
+JOB_STALE_SECONDS = get_setting("JOB_STALE_SECONDS", 60 * 3)
+# 중단된 작업을 찾는 주기(초)
+JOB_SWEEP_SECONDS = get_setting("JOB_SWEEP_SECONDS", 60)
+# 끝난 작업 기록 보관 기간(초)
+JOB_RETENTION_SECONDS = get_setting("JOB_RETENTION_SECONDS", 60 * 60 * 24)
+JOB_TIMING_SAMPLES = 500
+
+Jobs_collection = db['Jobs']
+
+def _percentile(values, ratio):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * ratio), len(ordered) - 1)]
+
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS):
+        self.worker_count = workers
+        self.handlers = {}
+        # Python 3.9의 asyncio.Queue는 생성 시점의 이벤트 루프에 묶이므로 서버 루프 안에서 만든다
+        self.queue = None
+        self.workers = []
+        self.sweeper = None
+        self.running = 0
+        self.wait_times = deque(maxlen=JOB_TIMING_SAMPLES)
+        self.run_times = deque(maxlen=JOB_TIMING_SAMPLES)
+        self.counters = {"enqueued": 0, "done": 0, "failed": 0, "retried": 0, "interrupted": 0, "recovered": 0}
+        self._indexes_ready = False
+
+    def _get_queue(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        return self.queue
+
+    def _ensure_indexes(self):
+        if not self._indexes_ready:
+            Jobs_collection.create_index("finishedAt", expireAfterSeconds=JOB_RETENTION_SECONDS)
+            Jobs_collection.create_index([("status", 1), ("createdAt", 1)])
+            self._indexes_ready = True
+
+    def register(self, job_type, handler):
+        # handler: async def handler(payload) -> JSON으로 저장 가능한 결과
+        self.handlers[job_type] = handler
+
+    async def enqueue(self, job_type, payload):
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        self._ensure_indexes()
+        jobId = str(uuid.uuid4())
+        Jobs_collection.insert_one({
+            "_id": jobId,
+            "type": job_type,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "runId": None,
+            "result": None,
+            "error": None,
+            "createdAt": datetime.datetime.utcnow(),
+            "startedAt": None,
+            "heartbeatAt": None,
+            "runAt": None,
+            "finishedAt": None
+        })
+        self.counters["enqueued"] += 1
+        await self._get_queue().put(jobId)
+        return jobId
+
+    async def start(self):
+        if self.workers:
+            return
+        self._ensure_indexes()
+        # 이전 프로세스에서 처리하지 못한 작업을 다시 큐에 넣는다
+        self._requeue_stale()
+        now = datetime.datetime.utcnow()
+        for doc in Jobs_collection.find({"status": "queued"}, {"_id": 1, "runAt": 1}).sort("createdAt", 1):
+            # 재시도 대기 중이던 작업은 남은 시간만큼 기다렸다가 넣는다
+            delay = (doc["runAt"] - now).total_seconds() if doc.get("runAt") else 0
+            self._schedule(doc["_id"], delay)
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+        self.sweeper = asyncio.create_task(self._sweep())
+
+    async def stop(self):
+        tasks = self.workers + ([self.sweeper] if self.sweeper else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.workers = []
+        self.sweeper = None
+
+    def _schedule(self, jobId, delay):
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._get_queue().put_nowait, jobId)
+        else:
+            self._get_queue().put_nowait(jobId)
+
+    def _requeue(self, current, delay, values, inc=None):
+        # 이번 실행이 아직 작업을 갖고 있을 때만 queued로 되돌리고 delay(초) 뒤에 다시 큐에 넣는다
+        runAt = datetime.datetime.utcnow() + datetime.timedelta(seconds=delay)
+        update = {"$set": {"status": "queued", "runId": None, "runAt": runAt, **values}}
+        if inc:
+            update["$inc"] = inc
+        if Jobs_collection.update_one(current, update).modified_count:
+            self._schedule(current["_id"], delay)
+
+    def _requeue_stale(self):
+        # 프로세스가 강제로 종료되어 heartbeat가 끊긴 running 작업을 queued로 되돌리고 그 id를 반환
+        # (오래 걸려도 heartbeat가 살아 있는 작업은 다른 워커/프로세스가 실행 중이므로 건드리지 않음)
+        stale_before = datetime.datetime.utcnow() - datetime.timedelta(seconds=JOB_STALE_SECONDS)
+        jobIds = []
+        # heartbeat 도입 전에 시작된 작업은 startedAt으로 판단
+        stale = {"$or": [{"heartbeatAt": {"$lt": stale_before}}, {"heartbeatAt": None, "startedAt": {"$lt": stale_before}}]}
+        for doc in Jobs_collection.find({"status": "running", **stale}, {"_id": 1, "runId": 1}):
+            updated = Jobs_collection.update_one(
+                {"_id": doc["_id"], "status": "running", "runId": doc.get("runId"), **stale},
+                {"$set": {"status": "queued", "runId": None}}
+            )
+            if updated.modified_count:
+                jobIds.append(doc["_id"])
+        self.counters["recovered"] += len(jobIds)
+        return jobIds
+
+    async def _sweep(self):
+        # 재시작 때만이 아니라 주기적으로도 중단된 작업을 찾아 다시 처리
+        while True:
+            await asyncio.sleep(JOB_SWEEP_SECONDS)
+            try:
+                for jobId in self._requeue_stale():
+                    self.queue.put_nowait(jobId)
+            except Exception as e:
+                print(f"Job sweep error: {e}")
+
+    async def _worker(self):
+        while True:
+            jobId = await self._get_queue().get()
+            try:
+                await self._run(jobId)
+            except Exception as e:
+                print(f"Job worker error ({jobId}): {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _heartbeat(self, jobId, runId):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                Jobs_collection.update_one({"_id": jobId, "runId": runId}, {"$set": {"heartbeatAt": datetime.datetime.utcnow()}})
+            except Exception as e:
+                print(f"Job heartbeat error ({jobId}): {e}")
+
+    async def _run(self, jobId):
+        # 다른 워커/프로세스가 먼저 가져간 작업이면 건너뜀
+        # runId: 이번 실행의 식별자, 다시 처리하도록 넘어간 작업의 결과를 예전 실행이 덮어쓰지 않게 한다
+        runId = str(uuid.uuid4())
+        now = datetime.datetime.utcnow()
+        job = Jobs_collection.find_one_and_update(
+            {"_id": jobId, "status": "queued"},
+            {"$set": {"status": "running", "runId": runId, "startedAt": now, "heartbeatAt": now}, "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            return
+        heartbeat = asyncio.create_task(self._heartbeat(jobId, runId))
+        try:
+            await self._execute(job, runId)
+        finally:
+            heartbeat.cancel()
+
+    async def _execute(self, job, runId):
+        jobId = job["_id"]
+        current = {"_id": jobId, "runId": runId}
+        # 작업 안에서 남기는 외부 호출 span은 작업 종류로 묶음
+        set_function_name(f"job:{job['type']}")
+        self.wait_times.append((job["startedAt"] - job["createdAt"]).total_seconds())
+        handler = self.handlers.get(job["type"])
+        self.running += 1
+        started = time.perf_counter()
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job type: {job['type']}")
+            result = await handler(job["payload"])
+        except (ProviderBusy, CircuitOpen) as e:
+            # 외부 API가 바쁘거나 장애 중인 경우는 시도 횟수에 넣지 않고 알려준 시간만큼 기다렸다가 다시 큐에 넣음
+            self._requeue(current, e.retry_after, {"error": str(e)}, inc={"attempts": -1})
+            return
+        except asyncio.CancelledError:
+            # 서버 종료/재시작으로 중단된 작업은 시도 횟수를 되돌리고 queued로 남겨 다음 시작 때 이어서 처리
+            self.counters["interrupted"] += 1
+            Jobs_collection.update_one(current, {"$set": {"status": "queued", "runId": None}, "$inc": {"attempts": -1}})
+            raise
+        except Exception as e:
+            print(f"Job {jobId} ({job['type']}) failed: {e}")
+            if job["attempts"] < JOB_MAX_ATTEMPTS:
+                self.counters["retried"] += 1
+                # 실패한 제공자를 바로 다시 두드리지 않도록 지수 백오프(지터 포함) 뒤에 재시도
+                backoff = min(JOB_RETRY_BACKOFF_MAX_SECONDS, JOB_RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1))
+                self._requeue(current, random.uniform(backoff / 2, backoff), {"error": str(e)})
+            else:
+                self.counters["failed"] += 1
+                Jobs_collection.update_one(current, {"$set": {
+                    "status": "failed", "error": str(e), "finishedAt": datetime.datetime.utcnow()}})
+            return
+        finally:
+            self.running -= 1
+            self.run_times.append(time.perf_counter() - started)
+        self.counters["done"] += 1
+        Jobs_collection.update_one(current, {"$set": {
+            "status": "done", "result": result, "error": None, "finishedAt": datetime.datetime.utcnow()}})
+
+    def get(self, jobId):
+        job = Jobs_collection.find_one({"_id": jobId}, {"payload": 0})
+        if job is None:
+            return None
+        job["jobId"] = job.pop("_id")
+        return job
+
+    def stats(self):
+        return {
+            **self.counters,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "running": self.running,
+            "workers": len(self.workers),
+            "wait_seconds_avg": round(sum(self.wait_times) / len(self.wait_times), 3) if self.wait_times else 0.0,
+            "wait_seconds_p95": round(_percentile(self.wait_times, 0.95), 3),
+            "run_seconds_avg": round(sum(self.run_times) / len(self.run_times), 3) if self.run_times else 0.0,
+            "run_seconds_p95": round(_percentile(self.run_times, 0.95), 3)
+        }
+
+job_queue = JobQueue()
@@ -0,0 +1,84 @@
+import json
+import re
+
+# LLM이 스트리밍으로 내보내는 JSON 배열을 조각 단위로 파싱
+# 배열 안의 최상위 객체가 닫히는 즉시 (원문, 파싱 결과)를 돌려준다. 파싱에 실패한 객체는 결과가 None
+# 배열 시작은 "[" 뒤에 (공백을 건너뛰고) "{"가 오는 위치로 본다. 앞에 나오는 "[참고]" 같은 설명 문구의 괄호는 무시
+
+class JSONArrayStreamParser:
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.started = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.object_start = None
+
+    def feed(self, text):
+        self.buffer += text
+        items = []
+        while self.pos < len(self.buffer) and not self.done:
+            ch = self.buffer[self.pos]
+            if not self.started:
+                if ch == "[":
+                    rest = self.buffer[self.pos + 1:].lstrip()
+                    if not rest:
+                        # "[" 뒤가 아직 도착하지 않았으면 다음 조각을 기다림
+                        break
+                    self.started = rest[0] == "{"
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                if self.depth > 0:
+                    self.in_string = True
+            elif ch == "{":
+                if self.depth == 0:
+                    self.object_start = self.pos
+                self.depth += 1
+            elif ch == "}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    raw = self.buffer[self.object_start:self.pos + 1]
+                    items.append((raw, parse_object(raw)))
+                    self.object_start = None
+            elif ch == "]" and self.depth == 0:
+                self.done = True
+            self.pos += 1
+
+        # 이미 처리한 앞부분은 버퍼에서 제거
+        keep_from = self.object_start if self.object_start is not None else self.pos
+        self.buffer = self.buffer[keep_from:]
+        self.pos -= keep_from
+        if self.object_start is not None:
+            self.object_start = 0
+        return items
+
+    def pending_fragment(self):
+        # 스트림이 끝났는데 닫히지 않은 객체가 있으면 그 원문
+        if self.object_start is None:
+            return None
+        return self.buffer[self.object_start:]
+
+def parse_object(raw):
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        pass
+    # 흔한 형식 오류(끝 쉼표, 따옴표 종류)는 로컬에서 한 번 고쳐본다
+    fixed = re.sub(r",\s*([}\]])", r"\1", raw).replace("“", '"').replace("”", '"')
+    try:
+        return json.loads(fixed)
+    except json.JSONDecodeError:
+        return None
+
+def parse_array(text):
+    # 스트리밍이 아닌 완성된 텍스트에서 객체들만 추출
+    parser = JSONArrayStreamParser()
+    return parser.feed(text)
@@ -0,0 +1,144 @@
+import asyncio
+import aiohttp
+import openai
+import google.generativeai as genai
+from database import OPENAI_API_KEY, GEMINI_API_KEY
+from utils.admission import get_admission
+from utils.resilience import call_with_resilience
+from utils.tracing import trace_span, openai_usage, gemini_usage, estimate_usage
+
+# LLM 호출 공용 레이어
+# 이벤트 루프를 막지 않도록 모든 호출을 async로 처리하고, 클라이언트/모델 객체는 한 번만 만든다
+# 모든 호출은 제공자별 admission 슬롯을 받은 뒤에 보낸다 (스트리밍은 끝날 때까지 슬롯 유지)
+# 마감 시간/재시도/서킷 브레이커는 resilience에서 처리 (스트리밍은 연결까지만 재시도)
+
+OPENAI_CHAT_MODEL = "gpt-4o"
+OPENAI_EMBEDDING_MODEL = "text-embedding-ada-002"
+GEMINI_MODEL_NAME = "gemini-1.5-flash"
+
+# 호출별 타임아웃(초)
+OPENAI_TIMEOUT = 60
+GEMINI_TIMEOUT = 60
+EMBEDDING_TIMEOUT = 20
+
+# OpenAI aiohttp 커넥션 풀 크기
+OPENAI_POOL_SIZE = 100
+
+openai.api_key = OPENAI_API_KEY
+genai.configure(api_key=GEMINI_API_KEY)
+gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+_openai_session = None
+
+def _get_openai_session():
+    # 프로세스 전체에서 하나의 aiohttp 세션(커넥션 풀)을 공유
+    global _openai_session
+    if _openai_session is None or _openai_session.closed:
+        connector = aiohttp.TCPConnector(limit=OPENAI_POOL_SIZE)
+        _openai_session = aiohttp.ClientSession(connector=connector)
+    # openai 0.28은 contextvar에 세션이 있으면 요청마다 새 세션을 만들지 않고 재사용한다
+    openai.aiosession.set(_openai_session)
+    return _openai_session
+
+async def close_clients():
+    global _openai_session
+    if _openai_session is not None and not _openai_session.closed:
+        await _openai_session.close()
+    _openai_session = None
+
+async def chat_completion(messages, functions=None, function_call=None, model=OPENAI_CHAT_MODEL, timeout=OPENAI_TIMEOUT):
+    _get_openai_session()
+    kwargs = {"model": model, "messages": messages, "request_timeout": timeout}
+    if functions:
+        kwargs["functions"] = functions
+        kwargs["function_call"] = function_call or "auto"
+    with trace_span("openai", "chat_completion", model) as span:
+        response = await call_with_resilience(
+            "openai",
+            lambda: openai.ChatCompletion.acreate(**kwargs),
+            timeout=timeout,
+            admission="openai"
+        )
+        openai_usage(span, response)
+    return response
+
+async def chat_completion_stream(messages, model=OPENAI_CHAT_MODEL, timeout=OPENAI_TIMEOUT):
+    # 응답 토큰을 생성되는 대로 하나씩 반환
+    _get_openai_session()
+    completion = []
+    with trace_span("openai", "chat_completion_stream", model) as span:
+        try:
+            async with get_admission("openai").slot():
+                response = await call_with_resilience(
+                    "openai",
+                    lambda: openai.ChatCompletion.acreate(model=model, messages=messages, stream=True, request_timeout=timeout),
+                    timeout=timeout
+                )
+                async for chunk in response:
+                    delta = chunk.choices[0].get("delta", {})
+                    content = delta.get("content")
+                    if content:
+                        completion.append(content)
+                        yield content
+        finally:
+            # 스트리밍은 사용량을 받지 못하므로 추정
+            estimate_usage(span, "".join(msg.get("content") or "" for msg in messages), "".join(completion))
+
+async def create_embeddings(texts, model=OPENAI_EMBEDDING_MODEL, timeout=EMBEDDING_TIMEOUT):
+    # 여러 문장을 한 번의 요청으로 임베딩
+    _get_openai_session()
+    with trace_span("openai", "embeddings", model) as span:
+        response = await call_with_resilience(
+            "openai",
+            lambda: openai.Embedding.acreate(input=texts, model=model, request_timeout=timeout),
+            timeout=timeout,
+            admission="openai"
+        )
+        openai_usage(span, response)
+    data = sorted(response['data'], key=lambda item: item['index'])
+    return [item['embedding'] for item in data]
+
+async def create_embedding(text, model=OPENAI_EMBEDDING_MODEL, timeout=EMBEDDING_TIMEOUT):
+    embeddings = await create_embeddings([text], model=model, timeout=timeout)
+    return embeddings[0]
+
+async def gemini_generate(prompt, timeout=GEMINI_TIMEOUT):
+    with trace_span("gemini", "generate", GEMINI_MODEL_NAME) as span:
+        response = await call_with_resilience(
+            "gemini",
+            lambda: gemini_model.generate_content_async(prompt, request_options={"timeout": timeout}),
+            timeout=timeout,
+            admission="gemini"
+        )
+        gemini_usage(span, response)
+    return response.text
+
+async def gemini_generate_stream(prompt, timeout=GEMINI_TIMEOUT):
+    # 생성되는 텍스트 조각을 순서대로 반환, 전체 스트림에 timeout(초) 마감 시간 적용
+    completion = []
+    with trace_span("gemini", "generate_stream", GEMINI_MODEL_NAME) as span:
+        try:
+            async with get_admission("gemini").slot():
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + timeout
+                response = await call_with_resilience(
+                    "gemini",
+                    lambda: gemini_model.generate_content_async(prompt, stream=True, request_options={"timeout": timeout}),
+                    timeout=timeout
+                )
+                iterator = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), max(deadline - loop.time(), 0))
+                    except StopAsyncIteration:
+                        break
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # 안전 필터 등으로 텍스트가 없는 조각은 건너뜀
+                        continue
+                    if text:
+                        completion.append(text)
+                        yield text
+        finally:
+            estimate_usage(span, prompt, "".join(completion))
@@ -0,0 +1,101 @@
+import re
+import zlib
+import numpy as np
+
+# 네트워크 없이 쓰는 로컬 임베딩
+# 한글/영문 텍스트를 글자 n-gram으로 쪼개 해싱한 뒤 여행 내 일정들 기준 TF-IDF 가중치를 적용한다
+
+LOCAL_EMBEDDING_MODEL = "local-hashed-ngram"
+LOCAL_EMBEDDING_DIM = 2048
+NGRAM_RANGE = (1, 3)
+
+_token_pattern = re.compile(r"[0-9a-z가-힣]+")
+
+def tokenize(text):
+    return _token_pattern.findall((text or "").lower())
+
+def term_counts(text, dim=LOCAL_EMBEDDING_DIM):
+    # 단어 단위 토큰과, 경계 표시를 붙인 단어 내부 글자 n-gram을 해시 버킷으로 집계
+    counts = {}
+    for token in tokenize(text):
+        features = [f"w:{token}"]
+        padded = f" {token} "
+        for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1):
+            if n == 1 and len(token) > 1:
+                continue
+            for i in range(len(padded) - n + 1):
+                gram = padded[i:i + n]
+                if gram.strip():
+                    features.append(gram)
+        for feature in features:
+            bucket = zlib.crc32(feature.encode('utf-8')) % dim
+            counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+def tf_vector(text, dim=LOCAL_EMBEDDING_DIM):
+    vector = np.zeros(dim, dtype=np.float32)
+    counts = term_counts(text, dim)
+    if counts:
+        buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        vector[buckets] = 1.0 + np.log(values)
+    return vector
+
+class LocalPlanIndex:
+    def __init__(self, dim=LOCAL_EMBEDDING_DIM):
+        self.dim = dim
+        self.rows = {}
+        self.planIds = []
+        self.matrix = None
+        self.idf = None
+        self.dirty = True
+
+    def sync(self, entries):
+        # entries: (planId, 해시, 일정 텍스트) 목록
+        # 바뀐 일정만 다시 벡터화하고, 구성이 바뀌었을 때만 IDF/행렬을 다시 만든다
+        current = {}
+        for planId, plan_hash, text in entries:
+            cached = self.rows.get(planId)
+            if cached and cached[0] == plan_hash:
+                current[planId] = cached
+            else:
+                current[planId] = (plan_hash, tf_vector(text, self.dim))
+                self.dirty = True
+        if current.keys() != self.rows.keys():
+            self.dirty = True
+        self.rows = current
+
+    def _rebuild(self):
+        self.planIds = list(self.rows.keys())
+        if not self.planIds:
+            self.matrix = None
+            self.idf = None
+            self.dirty = False
+            return
+        tf = np.vstack([self.rows[planId][1] for planId in self.planIds])
+        df = np.count_nonzero(tf, axis=0)
+        n = tf.shape[0]
+        self.idf = (np.log((1 + n) / (1 + df)) + 1.0).astype(np.float32)
+        matrix = tf * self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = np.ascontiguousarray(matrix / norms)
+        self.dirty = False
+
+    def search(self, query, k=1):
+        if self.dirty:
+            self._rebuild()
+        if self.matrix is None:
+            return []
+        query_vector = tf_vector(query, self.dim) * self.idf
+        norm = np.linalg.norm(query_vector)
+        if norm > 0:
+            query_vector /= norm
+        scores = self.matrix @ query_vector
+        k = min(k, len(self.planIds))
+        if k < len(self.planIds):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(self.planIds))
+        top = top[np.argsort(-scores[top])]
+        return [(self.planIds[i], float(scores[i])) for i in top]
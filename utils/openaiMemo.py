@@ -1,21 +1,17 @@
 import os
-import google.generativeai as genai
+from utils.llmClient import gemini_generate
+from utils.singleFlight import single_flight
 
-def openaiMemo(contry, city, GEMINI_API_KEY):
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-1.5-flash')
+# 같은 도시의 메모를 동시에 요청하면 한 번만 생성
+@single_flight("memo", key=lambda contry, city: (str(contry).strip().lower(), str(city).strip().lower()))
+async def openaiMemo(contry, city):
     query = f"{city}, {contry} 여행 할 때 신경써야할 점을 한국어 200자 이내로 알려줘 '\n'(개행) 꼭 넣어서"
 
-    response = model.generate_content(query)
-    
-    result = response.text
+    result = await gemini_generate(query)
     return result
 
-def openaiPlanMemo(places, GEMINI_API_KEY):
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-1.5-flash')
+async def openaiPlanMemo(places):
     query = f"{places} 여행 할 때 신경써야할 점을 한국어 200자 이내로 알려줘 '\n'(개행) 꼭 넣어서 "
-    response = model.generate_content(query)
-    
-    result = response.text
+
+    result = await gemini_generate(query)
     return result
@@ -0,0 +1,167 @@
+import json
+import math
+import re
+from database import get_setting
+from utils.llmClient import gemini_generate
+from utils.promptCodec import encode_rows, describe_columns
+from utils.resilience import is_available
+
+# 사용자 성향 기반 장소 정렬
+# 별점, 가격대, 여행지 좌표로부터의 거리, 카테고리 키워드를 성향별 가중치로 합산해서 결정적으로 정렬한다
+# LLM은 점수가 거의 같은 장소들의 순서를 정할 때만 선택적으로 사용
+
+PLACE_RANKING_LLM_TIEBREAK = get_setting("PLACE_RANKING_LLM_TIEBREAK", False)
+TIE_EPSILON = 0.02
+
+# 기본 가중치, 성향 값에 따라 아래 PERSONALITY_WEIGHTS로 덮어쓴다
+BASE_WEIGHTS = {
+    "rating": 1.0,
+    "price": 0.0,
+    "distance": 0.5,
+    "photo": 0.0
+}
+
+PERSONALITY_WEIGHTS = {
+    "money1": {"price": 0.6},      # 비싸고 좋은 곳
+    "money2": {"price": -0.6},     # 저렴한 곳
+    "food1": {"rating": 1.6},      # 평점 높은 곳 위주
+    "food2": {"rating": 0.5},      # 평점 상관 없음
+    "transport1": {"distance": 1.2},  # 가까운 곳
+    "transport2": {"distance": 0.2},  # 멀어도 괜찮음
+    "photo1": {"photo": 0.0},
+    "photo2": {"photo": 0.8}       # 포토스팟 위주
+}
+
+PHOTO_KEYWORDS = (
+    "tourist attraction", "landmark", "viewpoint", "view", "observation", "scenic", "park", "garden",
+    "beach", "museum", "gallery", "monument", "historical", "church", "cathedral", "basilica", "temple",
+    "palace", "castle", "tower", "bridge", "square", "plaza", "market", "street art",
+    "전망", "포토", "사진", "야경", "명소", "공원", "해변", "광장"
+)
+
+# 거리 점수가 절반이 되는 거리(km)
+DISTANCE_HALF_KM = 3.0
+
+# 금액으로 된 가격을 달러 기준 가격대로 바꿀 때 쓰는 대략적인 환율 (1달러당, 없으면 1)
+CURRENCY_PER_USD = {"₩": 1300.0, "원": 1300.0, "¥": 150.0, "円": 150.0}
+
+def parse_personality(personality):
+    # 문자열(JSON)/딕셔너리 모두 받아서 {"money": "money1", ...} 형태로 반환
+    if isinstance(personality, str):
+        try:
+            personality = json.loads(personality)
+        except (json.JSONDecodeError, TypeError):
+            return {}
+    if not isinstance(personality, dict):
+        return {}
+    return personality
+
+def build_weights(personality):
+    weights = dict(BASE_WEIGHTS)
+    for value in parse_personality(personality).values():
+        weights.update(PERSONALITY_WEIGHTS.get(value, {}))
+    return weights
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+def price_level(price):
+    # "$$", "€€€", "₩₩" 처럼 기호 개수로 가격대를 표현하는 값을 1~4로 변환, 알 수 없으면 None
+    if not price:
+        return None
+    symbols = re.findall(r"[$€£¥₩]", str(price))
+    if symbols and len(set(symbols)) == 1 and len(symbols) <= 4 and not re.search(r"\d", str(price)):
+        return len(symbols)
+    # "₩10,000"처럼 천 단위 구분 쉼표가 있는 금액은 쉼표를 지우고 읽는다
+    text = str(price).replace(",", "")
+    amounts = [float(amount) for amount in re.findall(r"\d+(?:\.\d+)?", text)]
+    if amounts:
+        # "$10–20" 같은 금액 범위는 대략적인 구간으로 환산
+        rate = next((rate for symbol, rate in CURRENCY_PER_USD.items() if symbol in text), 1.0)
+        amount = sum(amounts) / len(amounts) / rate
+        return 1 if amount < 15 else 2 if amount < 40 else 3 if amount < 80 else 4
+    return None
+
+def photo_score(place):
+    text = " ".join(str(place.get(key) or "") for key in ("type", "title", "description")).lower()
+    return 1.0 if any(keyword in text for keyword in PHOTO_KEYWORDS) else 0.0
+
+def score_place(place, weights, origin=None):
+    rating = place.get("rating")
+    rating_score = (float(rating) / 5.0) if rating else 0.5
+
+    level = price_level(place.get("price"))
+    # 가격 정보가 없으면 중간값으로 취급
+    price_score = ((level - 1) / 3.0) if level else 0.5
+
+    distance_score = 0.5
+    if origin and origin[0] is not None and origin[1] is not None and place.get("latitude") is not None and place.get("longitude") is not None:
+        distance = haversine_km(float(origin[0]), float(origin[1]), float(place["latitude"]), float(place["longitude"]))
+        distance_score = DISTANCE_HALF_KM / (DISTANCE_HALF_KM + distance)
+
+    return (weights["rating"] * rating_score
+            + weights["price"] * price_score
+            + weights["distance"] * distance_score
+            + weights["photo"] * photo_score(place))
+
+def rank_places(places, personality, latitude=None, longitude=None):
+    # (점수, 장소) 리스트를 점수 내림차순으로 반환, 동점이면 별점 -> 원래 순서
+    weights = build_weights(personality)
+    origin = (latitude, longitude)
+    scored = [(score_place(place, weights, origin), i, place) for i, place in enumerate(places)]
+    scored.sort(key=lambda item: (-item[0], -(float(item[2].get("rating") or 0)), item[1]))
+    return [(score, place) for score, _, place in scored]
+
+def _apply_order(group, order):
+    # 잘못된 번호는 버리고, 빠진 장소는 원래 순서대로 뒤에 붙인다
+    seen = []
+    for i in order if isinstance(order, list) else []:
+        if isinstance(i, int) and 0 <= i < len(group) and i not in seen:
+            seen.append(i)
+    seen += [i for i in range(len(group)) if i not in seen]
+    return [group[i] for i in seen]
+
+async def _llm_tiebreak(groups, personality):
+    # 모든 동점 그룹을 한 번의 요청으로 보내고, 그룹 안에서의 번호로만 주고받아 제목 매칭 없이 순서를 정한다
+    columns = ["title", "type", "rating", "price", "description"]
+    tables = []
+    for g, group in enumerate(groups):
+        table, _ = encode_rows(group, columns)
+        tables.append(f"그룹 {g}:\n{table}")
+    prompt = (f"사용자의 성향: {json.dumps(parse_personality(personality), ensure_ascii=False)}\n"
+              f"장소 목록({describe_columns(columns)}):\n" + "\n".join(tables) + "\n"
+              "각 그룹 안에서 성향에 더 잘 맞는 순서대로 장소 번호만, 그룹 순서대로 JSON 배열의 배열로 답해줘. "
+              "예: [[2, 0, 1], [1, 0]]")
+    try:
+        response = await gemini_generate(prompt)
+        orders = json.loads(re.search(r"\[\s*\[[\d\s,\[\]]*\]\s*\]", response).group())
+    except Exception as e:
+        print(f"Place ranking tie-break failed: {e}")
+        return groups
+    return [_apply_order(group, orders[g] if g < len(orders) else []) for g, group in enumerate(groups)]
+
+async def rank_places_async(places, personality, latitude=None, longitude=None, use_llm_tiebreak=None):
+    ranked = rank_places(places, personality, latitude, longitude)
+    if use_llm_tiebreak is None:
+        use_llm_tiebreak = PLACE_RANKING_LLM_TIEBREAK
+    # Gemini 서킷이 열려 있으면 LLM 없이 점수 순서 그대로 사용
+    if not use_llm_tiebreak or not is_available("gemini"):
+        return [place for _, place in ranked]
+
+    groups = []
+    i = 0
+    while i < len(ranked):
+        j = i + 1
+        while j < len(ranked) and ranked[i][0] - ranked[j][0] <= TIE_EPSILON:
+            j += 1
+        groups.append([place for _, place in ranked[i:j]])
+        i = j
+
+    ties = [g for g, group in enumerate(groups) if len(group) > 1]
+    if ties:
+        ordered = await _llm_tiebreak([groups[g] for g in ties], personality)
+        for g, group in zip(ties, ordered):
+            groups[g] = group
+    return [place for group in groups for place in group]
@@ -0,0 +1,86 @@
+import hashlib
+from pymongo import UpdateOne
+from database import db
+from utils.llmClient import create_embeddings, OPENAI_EMBEDDING_MODEL
+
+# tripPlans 임베딩 캐시
+# 일정 내용의 해시를 키로 PlanEmbedding 컬렉션에 저장하고, 캐시에 없는 일정만 한 번의 요청으로 임베딩한다
+
+PlanEmbedding_collection = db['PlanEmbedding']
+_indexes_ready = False
+
+plan_embedding_counters = {"hits": 0, "misses": 0}
+
+def _ensure_indexes():
+    global _indexes_ready
+    if not _indexes_ready:
+        PlanEmbedding_collection.create_index("planId", unique=True)
+        PlanEmbedding_collection.create_index("tripId")
+        _indexes_ready = True
+
+def plan_text(plan):
+    return f"{plan.title} {plan.date} {plan.time} {plan.place} {plan.address} {plan.description}"
+
+def content_hash(text, model=OPENAI_EMBEDDING_MODEL):
+    return hashlib.sha256(f"{model}:{text}".encode('utf-8')).hexdigest()
+
+async def get_plan_embeddings(plans, query=None, model=OPENAI_EMBEDDING_MODEL):
+    # plans 순서대로 임베딩 리스트 반환, query가 있으면 캐시 미스와 같은 요청에 묶어서 함께 임베딩
+    texts = [plan_text(plan) for plan in plans]
+    hashes = [content_hash(text, model) for text in texts]
+
+    _ensure_indexes()
+    cached = {}
+    if plans:
+        for doc in PlanEmbedding_collection.find({"planId": {"$in": [plan.planId for plan in plans]}}, {"_id": 0, "planId": 1, "hash": 1, "embedding": 1}):
+            cached[doc["planId"]] = doc
+
+    embeddings = [None] * len(plans)
+    miss_indexes = []
+    for i, plan in enumerate(plans):
+        doc = cached.get(plan.planId)
+        if doc and doc["hash"] == hashes[i]:
+            embeddings[i] = doc["embedding"]
+        else:
+            miss_indexes.append(i)
+
+    request_texts = [texts[i] for i in miss_indexes]
+    if query is not None:
+        request_texts.append(query)
+
+    query_embedding = None
+    if request_texts:
+        fetched = await create_embeddings(request_texts, model=model)
+        if query is not None:
+            query_embedding = fetched.pop()
+        updates = []
+        for i, embedding in zip(miss_indexes, fetched):
+            embeddings[i] = embedding
+            plan = plans[i]
+            updates.append(UpdateOne(
+                {"planId": plan.planId},
+                {"$set": {"planId": plan.planId, "tripId": plan.tripId, "hash": hashes[i], "model": model, "embedding": embedding}},
+                upsert=True
+            ))
+        if updates:
+            PlanEmbedding_collection.bulk_write(updates, ordered=False)
+
+    plan_embedding_counters["hits"] += len(plans) - len(miss_indexes)
+    plan_embedding_counters["misses"] += len(miss_indexes)
+    return embeddings, query_embedding
+
+def plan_embedding_stats():
+    lookups = plan_embedding_counters["hits"] + plan_embedding_counters["misses"]
+    return {
+        **plan_embedding_counters,
+        "hit_rate": round(plan_embedding_counters["hits"] / lookups, 4) if lookups else 0.0
+    }
+
+def invalidate_plan_embeddings(planIds):
+    if not planIds:
+        return
+    PlanEmbedding_collection.delete_many({"planId": {"$in": list(planIds)}})
+
+def invalidate_trip_embeddings(tripId):
+    # 여행을 삭제할 때 그 여행의 일정 임베딩을 모두 삭제
+    PlanEmbedding_collection.delete_many({"tripId": tripId})
@@ -0,0 +1,137 @@
+from collections import OrderedDict
+import numpy as np
+from database import get_setting
+from utils.planEmbedding import get_plan_embeddings, plan_text, content_hash
+from utils.llmClient import OPENAI_EMBEDDING_MODEL
+from utils.localEmbedding import LocalPlanIndex, LOCAL_EMBEDDING_MODEL
+
+# 여행(tripId)별 일정 벡터 인덱스
+# 정규화된 float32 행렬을 연속 메모리로 유지해서 유사도 검색을 행렬-벡터 곱 한 번으로 처리한다
+
+PLAN_INDEX_MAX_TRIPS = get_setting("PLAN_INDEX_MAX_TRIPS", 1000)
+
+# "openai"(기본): text-embedding-ada-002 임베딩 사용 (PlanEmbedding 캐시), "local": 네트워크 없이 글자 n-gram TF-IDF로 검색
+EMBEDDING_BACKEND = get_setting("EMBEDDING_BACKEND", "openai")
+
+def normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return vector
+    return vector / norm
+
+class PlanVectorIndex:
+    def __init__(self, dim=None, capacity=16):
+        self.dim = dim
+        self.capacity = capacity
+        self.matrix = None
+        self.size = 0
+        self.planIds = []
+        self.hashes = []
+        self.positions = {}
+
+    def _ensure_capacity(self, dim):
+        if self.matrix is None:
+            self.dim = dim
+            self.matrix = np.zeros((self.capacity, dim), dtype=np.float32)
+        elif self.size == self.capacity:
+            self.capacity *= 2
+            matrix = np.zeros((self.capacity, self.dim), dtype=np.float32)
+            matrix[:self.size] = self.matrix[:self.size]
+            self.matrix = matrix
+
+    def get_hash(self, planId):
+        position = self.positions.get(planId)
+        if position is None:
+            return None
+        return self.hashes[position]
+
+    def upsert(self, planId, plan_hash, vector):
+        vector = normalize(vector)
+        position = self.positions.get(planId)
+        if position is None:
+            self._ensure_capacity(vector.shape[0])
+            position = self.size
+            self.size += 1
+            self.planIds.append(planId)
+            self.hashes.append(plan_hash)
+            self.positions[planId] = position
+        else:
+            self.hashes[position] = plan_hash
+        self.matrix[position] = vector
+
+    def remove(self, planId):
+        # 마지막 행을 삭제 위치로 옮겨서 행렬을 빈틈없이 유지
+        position = self.positions.pop(planId, None)
+        if position is None:
+            return
+        last = self.size - 1
+        if position != last:
+            self.matrix[position] = self.matrix[last]
+            self.planIds[position] = self.planIds[last]
+            self.hashes[position] = self.hashes[last]
+            self.positions[self.planIds[position]] = position
+        self.planIds.pop()
+        self.hashes.pop()
+        self.size -= 1
+
+    def search(self, query_vector, k=1):
+        if self.size == 0:
+            return []
+        scores = self.matrix[:self.size] @ normalize(query_vector)
+        k = min(k, self.size)
+        if k < self.size:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(self.size)
+        top = top[np.argsort(-scores[top])]
+        return [(self.planIds[i], float(scores[i])) for i in top]
+
+
+plan_indexes = OrderedDict()
+
+def get_trip_index(tripId, model=OPENAI_EMBEDDING_MODEL):
+    key = (tripId, model)
+    index = plan_indexes.get(key)
+    if index is None:
+        index = LocalPlanIndex() if model == LOCAL_EMBEDDING_MODEL else PlanVectorIndex()
+        plan_indexes[key] = index
+        while len(plan_indexes) > PLAN_INDEX_MAX_TRIPS:
+            plan_indexes.popitem(last=False)
+    else:
+        plan_indexes.move_to_end(key)
+    return index
+
+async def find_similar_plans(plans, query, tripId, k=1, backend=None):
+    # 인덱스를 현재 일정과 동기화(바뀐 일정만 다시 임베딩)한 뒤 상위 k개 (plan, 유사도) 반환
+    backend = backend or EMBEDDING_BACKEND
+    plans_by_id = {plan.planId: plan for plan in plans}
+
+    if backend == "local":
+        index = get_trip_index(tripId, LOCAL_EMBEDDING_MODEL)
+        entries = []
+        for plan in plans:
+            text = plan_text(plan)
+            entries.append((plan.planId, content_hash(text, LOCAL_EMBEDDING_MODEL), text))
+        index.sync(entries)
+        return [(plans_by_id[planId], score) for planId, score in index.search(query, k)]
+
+    model = OPENAI_EMBEDDING_MODEL
+    index = get_trip_index(tripId, model)
+
+    for planId in [planId for planId in index.planIds if planId not in plans_by_id]:
+        index.remove(planId)
+
+    stale_plans = []
+    stale_hashes = []
+    for plan in plans:
+        plan_hash = content_hash(plan_text(plan), model)
+        if index.get_hash(plan.planId) != plan_hash:
+            stale_plans.append(plan)
+            stale_hashes.append(plan_hash)
+
+    embeddings, query_embedding = await get_plan_embeddings(stale_plans, query=query, model=model)
+    for plan, plan_hash, embedding in zip(stale_plans, stale_hashes, embeddings):
+        index.upsert(plan.planId, plan_hash, embedding)
+
+    return [(plans_by_id[planId], score) for planId, score in index.search(query_embedding, k)]
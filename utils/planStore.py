@@ -0,0 +1,48 @@
+import uuid
+from sqlalchemy import insert, update
+from models.models import myTrips, tripPlans
+from database import db
+
+# 여러 일정을 한 트랜잭션으로 저장
+# tripPlans 행은 executemany 한 번으로 넣고, 메모 업데이트도 같은 트랜잭션에서 처리한다
+# SavePlace 정리는 커밋이 성공한 다음에만 수행
+
+PLAN_FIELDS = ("title", "date", "time", "place", "address", "latitude", "longitude", "description")
+
+def build_plan_rows(userId, tripId, datas):
+    rows = []
+    for data in datas:
+        row = {field: data[field] for field in PLAN_FIELDS}
+        row.update({
+            "planId": str(uuid.uuid4()),
+            "userId": userId,
+            "tripId": tripId,
+            "crewId": data.get("crewId")
+        })
+        rows.append(row)
+    return rows
+
+def insert_trip_plans_bulk(session, userId, tripId, datas, memo=None):
+    # 저장된 planId 목록 반환, 실패하면 전부 롤백하고 예외를 다시 던진다
+    rows = build_plan_rows(userId, tripId, datas)
+    try:
+        if rows:
+            session.execute(insert(tripPlans), rows)
+        if memo is not None:
+            session.execute(update(myTrips).where(myTrips.tripId == tripId).values(memo=memo))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return [row["planId"] for row in rows]
+
+def clear_saved_places(userId, tripId, places=None):
+    # places가 없으면 SavePlace 문서 전체 삭제, 있으면 해당 장소만 제거
+    save_place_collection = db['SavePlace']
+    if places is None:
+        save_place_collection.delete_one({"userId": userId, "tripId": tripId})
+    else:
+        save_place_collection.update_one(
+            {"userId": userId, "tripId": tripId},
+            {"$pull": {"placeData": {"title": {"$in": list(places)}}}}
+        )
@@ -0,0 +1,100 @@
+from utils.llmClient import gemini_generate, gemini_generate_stream
+from utils.jsonStream import JSONArrayStreamParser, parse_array
+from utils.promptCodec import encode_rows, describe_columns
+
+# solve_itinerary가 만든 일정의 제목과 설명 문구를 LLM으로 작성
+# 응답은 스트리밍 JSON 배열로 받아 객체가 닫히는 즉시 반영하고, 깨진 조각만 모아 한 번 고쳐달라고 요청한다
+
+# 제목/설명 작성 프롬프트의 일정 표 토큰 예산 (넘으면 설명을 더 짧게 자름)
+PLAN_TEXT_PROMPT_TOKENS = 3000
+
+def _apply_plan_text(plans, item):
+    # 검증을 통과한 항목만 반영하고 해당 일정 번호를 반환
+    if not isinstance(item, dict) or not isinstance(item.get("i"), int) or not 0 <= item["i"] < len(plans):
+        return None
+    plan = plans[item["i"]]
+    if item.get("title"):
+        plan["title"] = str(item["title"])[:255]
+    if item.get("description"):
+        plan["description"] = str(item["description"])[:255]
+    return item["i"]
+
+async def _repair_fragments(fragments):
+    # 형식이 깨진 조각들만 모아 한 번만 고쳐달라고 요청
+    prompt = (
+        "다음 JSON 객체 조각들의 문법 오류만 고쳐서 같은 내용의 JSON 배열로만 답해줘. "
+        '각 객체는 {"i": 번호, "title": "...", "description": "..."} 형태야.\n' + "\n".join(fragments)
+    )
+    try:
+        response = await gemini_generate(prompt)
+    except Exception as e:
+        print(f"Failed to repair plan texts: {e}")
+        return []
+    return [item for _, item in parse_array(response) if item is not None]
+
+async def write_plan_texts(plans, on_day=None):
+    # LLM으로 일정 제목/설명만 작성, 실패하면 기본 제목과 장소 설명을 그대로 사용
+    # 응답을 스트리밍으로 받으면서 객체가 닫히는 즉시 검증/반영하고,
+    # 하루치 일정이 모두 처리되면 on_day(date, day_plans)로 바로 넘긴다 (날짜 순서 유지)
+    if not plans:
+        return plans
+    columns = ["date", "time", "place", "kind", "description"]
+    rows = [
+        {"date": plan["date"], "time": plan["time"][:5], "place": plan["place"],
+         "kind": "식사" if plan["_meal"] else "관광", "description": plan["description"]}
+        for plan in plans
+    ]
+    table, _ = encode_rows(rows, columns, token_budget=PLAN_TEXT_PROMPT_TOKENS)
+    prompt = (
+        "다음 여행 일정 각각에 대해 장소에서 할 일을 나타내는 짧은 제목(예: 에펠탑 관광)과 "
+        "한국어 한두 문장 설명을 만들어줘. 번호(i)를 그대로, 번호 순서대로 사용해서 "
+        '[{"i": 0, "title": "...", "description": "..."}] 형태의 JSON 배열로만 답해줘.\n'
+        f"일정 표({describe_columns(columns)}):\n" + table
+    )
+
+    day_order = []
+    remaining = {}
+    for plan in plans:
+        if plan["date"] not in remaining:
+            day_order.append(plan["date"])
+            remaining[plan["date"]] = 0
+        remaining[plan["date"]] += 1
+    handled = set()
+    emitted = 0
+
+    async def flush(final=False):
+        nonlocal emitted
+        while emitted < len(day_order) and (final or remaining[day_order[emitted]] == 0):
+            date = day_order[emitted]
+            emitted += 1
+            if on_day is not None:
+                await on_day(date, [plan for plan in plans if plan["date"] == date])
+
+    def mark(index):
+        if index is not None and index not in handled:
+            handled.add(index)
+            remaining[plans[index]["date"]] -= 1
+
+    parser = JSONArrayStreamParser()
+    malformed = []
+    try:
+        async for chunk in gemini_generate_stream(prompt):
+            for raw, item in parser.feed(chunk):
+                if item is None:
+                    malformed.append(raw)
+                    continue
+                mark(_apply_plan_text(plans, item))
+                await flush()
+            if parser.done:
+                break
+    except Exception as e:
+        print(f"Failed to write plan texts: {e}")
+    if parser.pending_fragment():
+        malformed.append(parser.pending_fragment())
+
+    if malformed:
+        for item in await _repair_fragments(malformed):
+            mark(_apply_plan_text(plans, item))
+    # 끝까지 제목을 받지 못한 일정은 기본 제목으로 남긴 채 내보냄
+    await flush(final=True)
+    return plans
@@ -0,0 +1,71 @@
+import json
+from utils.tokenCounter import estimate_tokens
+
+# 장소/일정 목록을 프롬프트에 넣을 때 쓰는 압축 표기
+# JSON 대신 짧은 열 이름의 표(헤더 한 줄 + "|" 구분 행)로 만들고, 값이 없는 열은 빼고, 설명은 길이 예산 안으로 자른다
+
+SHORT_KEYS = {
+    "title": "t",
+    "place": "p",
+    "date": "d",
+    "time": "tm",
+    "address": "a",
+    "rating": "r",
+    "price": "$",
+    "type": "ty",
+    "kind": "k",
+    "latitude": "lat",
+    "longitude": "lng",
+    "description": "desc"
+}
+DESCRIPTION_CHARS = 80
+MIN_DESCRIPTION_CHARS = 20
+
+prompt_codec_counters = {"calls": 0, "tokens_before": 0, "tokens_after": 0}
+
+def _cell(value, limit=None):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        value = round(value, 5)
+    text = str(value).replace("|", "/").replace("\n", " ").strip()
+    if limit is not None and len(text) > limit:
+        text = text[:limit - 1] + "…"
+    return text
+
+def _render(rows, columns, description_chars, index):
+    header = (["i"] if index else []) + [SHORT_KEYS.get(column, column) for column in columns]
+    lines = ["|".join(header)]
+    for i, row in enumerate(rows):
+        cells = [str(i)] if index else []
+        cells += [_cell(row.get(column), description_chars if column == "description" else None) for column in columns]
+        lines.append("|".join(cells))
+    return "\n".join(lines)
+
+def encode_rows(rows, columns, description_chars=DESCRIPTION_CHARS, token_budget=None, index=True):
+    # (압축 텍스트, {"tokens_before", "tokens_after"}) 반환
+    # token_budget이 있으면 넘지 않을 때까지 설명 길이를 절반씩 줄인다 (최소 MIN_DESCRIPTION_CHARS)
+    columns = [column for column in columns if any(row.get(column) not in (None, "") for row in rows)]
+    text = _render(rows, columns, description_chars, index)
+    while token_budget is not None and estimate_tokens(text) > token_budget and "description" in columns and description_chars > MIN_DESCRIPTION_CHARS:
+        description_chars = max(description_chars // 2, MIN_DESCRIPTION_CHARS)
+        text = _render(rows, columns, description_chars, index)
+
+    stats = {
+        "tokens_before": estimate_tokens(json.dumps(rows, ensure_ascii=False, default=str)),
+        "tokens_after": estimate_tokens(text)
+    }
+    prompt_codec_counters["calls"] += 1
+    prompt_codec_counters["tokens_before"] += stats["tokens_before"]
+    prompt_codec_counters["tokens_after"] += stats["tokens_after"]
+    return text, stats
+
+def describe_columns(columns):
+    # 프롬프트 앞에 붙일 열 이름 설명 (예: "t=title, d=date")
+    return ", ".join(f"{SHORT_KEYS[column]}={column}" for column in columns if column in SHORT_KEYS)
+
+def prompt_codec_stats():
+    stats = dict(prompt_codec_counters)
+    before = stats["tokens_before"]
+    stats["saved_ratio"] = round(1 - stats["tokens_after"] / before, 3) if before else 0.0
+    return stats
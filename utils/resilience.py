@@ -0,0 +1,191 @@
+import asyncio
+import random
+import time
+import aiohttp
+import httpx
+import openai
+import requests
+from deep_translator import exceptions as translator_exceptions
+from google.api_core import exceptions as google_exceptions
+from database import get_setting
+from utils.admission import ProviderBusy, get_admission
+
+# 외부 API 호출 공통 보호 장치
+# 제공자별 마감 시간(timeout), 지터를 준 지수 백오프 재시도, 연속 실패 시 잠시 호출을 막는 서킷 브레이커
+# 서킷이 열려 있거나 재시도까지 실패하면 fallback(캐시된 값, 정렬 안 된 목록 등)이 있으면 그걸 돌려준다
+
+DEFAULT_POLICIES = {
+    # timeout: 시도 한 번의 마감 시간(초), retries: 추가 시도 횟수, backoff/backoff_max: 백오프 기준/최대(초)
+    # failure_threshold: 서킷을 여는 연속 실패 수, reset_seconds: 서킷을 연 뒤 다시 시험해보기까지의 시간(초)
+    "openai": {"timeout": 60, "retries": 2, "backoff": 0.5, "backoff_max": 8, "failure_threshold": 5, "reset_seconds": 30},
+    "openai_image": {"timeout": 90, "retries": 1, "backoff": 1.0, "backoff_max": 8, "failure_threshold": 3, "reset_seconds": 60},
+    "gemini": {"timeout": 60, "retries": 2, "backoff": 0.5, "backoff_max": 8, "failure_threshold": 5, "reset_seconds": 30},
+    "serpapi": {"timeout": 20, "retries": 2, "backoff": 0.5, "backoff_max": 4, "failure_threshold": 5, "reset_seconds": 30},
+    "translator": {"timeout": 10, "retries": 1, "backoff": 0.3, "backoff_max": 2, "failure_threshold": 10, "reset_seconds": 30},
+    "weather": {"timeout": 10, "retries": 2, "backoff": 0.3, "backoff_max": 2, "failure_threshold": 5, "reset_seconds": 60},
+    "kakao": {"timeout": 10, "retries": 1, "backoff": 0.3, "backoff_max": 2, "failure_threshold": 5, "reset_seconds": 30},
+    # 인가 코드는 한 번만 쓸 수 있으므로 토큰 발급은 재시도하지 않음
+    "kakao_token": {"timeout": 10, "retries": 0, "backoff": 0.3, "backoff_max": 2, "failure_threshold": 5, "reset_seconds": 30},
+    "image_download": {"timeout": 30, "retries": 2, "backoff": 0.5, "backoff_max": 4, "failure_threshold": 5, "reset_seconds": 30}
+}
+RESILIENCE_POLICIES = {**DEFAULT_POLICIES, **get_setting("RESILIENCE_POLICIES", {})}
+
+class CircuitOpen(Exception):
+    def __init__(self, provider, retry_after):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"{provider} is temporarily unavailable, retry after {retry_after}s")
+
+class RetryableStatus(Exception):
+    # 응답은 왔지만 다시 시도할 만한 상태 코드(429, 5xx)
+    def __init__(self, status_code, detail=""):
+        self.status_code = status_code
+        super().__init__(f"HTTP {status_code} {detail}".strip())
+
+RETRYABLE_EXCEPTIONS = (
+    asyncio.TimeoutError,
+    ConnectionError,
+    RetryableStatus,
+    httpx.TransportError,
+    aiohttp.ClientError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    translator_exceptions.RequestError,
+    translator_exceptions.TooManyRequests,
+    translator_exceptions.ServerException,
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+    openai.error.RateLimitError,
+    openai.error.ServiceUnavailableError,
+    openai.error.TryAgain,
+    openai.error.APIError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError
+)
+
+def raise_for_retryable_status(response):
+    # httpx 응답이 429/5xx면 재시도 대상 예외로 바꾼다 (그 외 4xx는 호출한 쪽에서 처리)
+    if response.status_code == 429 or response.status_code >= 500:
+        raise RetryableStatus(response.status_code, response.text[:200])
+    return response
+
+class CircuitBreaker:
+    # closed(정상) -> 연속 실패가 쌓이면 open(즉시 실패) -> reset_seconds 뒤 half_open(한 번만 시험) -> 성공하면 closed
+    def __init__(self, provider, failure_threshold, reset_seconds):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def allow(self):
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+            self.probing = False
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def retry_after(self):
+        return max(1, int(self.reset_seconds - (time.monotonic() - self.opened_at)) + 1)
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+_breakers = {}
+resilience_counters = {}
+
+def get_breaker(provider):
+    if provider not in _breakers:
+        policy = RESILIENCE_POLICIES[provider]
+        _breakers[provider] = CircuitBreaker(provider, policy["failure_threshold"], policy["reset_seconds"])
+        resilience_counters[provider] = {"calls": 0, "retries": 0, "failures": 0, "short_circuited": 0, "fallbacks": 0}
+    return _breakers[provider]
+
+def is_available(provider):
+    # 서킷이 열려 있는지만 확인 (시험 호출 기회를 쓰지 않음)
+    breaker = get_breaker(provider)
+    return breaker.state == "closed" or (breaker.state == "open" and time.monotonic() - breaker.opened_at >= breaker.reset_seconds)
+
+async def _use_fallback(provider, fallback, error):
+    resilience_counters[provider]["fallbacks"] += 1
+    print(f"{provider} degraded: {error}")
+    value = fallback()
+    if asyncio.iscoroutine(value):
+        value = await value
+    return value
+
+async def _attempt(call, timeout, admission):
+    # admission 슬롯은 마감 시간 밖에서 받는다: 우리 쪽 대기열에서 기다린 시간은 제공자 지연/장애로 세지 않음
+    if admission is None:
+        return await asyncio.wait_for(call(), timeout)
+    async with get_admission(admission).slot():
+        return await asyncio.wait_for(call(), timeout)
+
+async def call_with_resilience(provider, call, timeout=None, fallback=None, admission=None):
+    # call: 인자 없이 코루틴을 만드는 함수 (재시도마다 새로 호출)
+    # fallback: 실패 시 대신 돌려줄 값을 만드는 함수, 없으면 마지막 예외(또는 CircuitOpen)를 그대로 던진다
+    # admission: 시도마다 받을 admission 슬롯의 제공자 이름 (백오프 동안에는 슬롯을 잡지 않음)
+    policy = RESILIENCE_POLICIES[provider]
+    breaker = get_breaker(provider)
+    counters = resilience_counters[provider]
+    counters["calls"] += 1
+    timeout = timeout or policy["timeout"]
+
+    if not breaker.allow():
+        counters["short_circuited"] += 1
+        error = CircuitOpen(provider, breaker.retry_after())
+        if fallback is not None:
+            return await _use_fallback(provider, fallback, error)
+        raise error
+
+    for attempt in range(policy["retries"] + 1):
+        try:
+            result = await _attempt(call, timeout, admission)
+        except ProviderBusy:
+            # 우리 쪽 대기열이 가득 찬 것이라 제공자 장애로 보지 않음
+            breaker.probing = False
+            raise
+        except RETRYABLE_EXCEPTIONS as e:
+            counters["failures"] += 1
+            breaker.record_failure()
+            error = e
+            if attempt < policy["retries"] and breaker.state != "open":
+                counters["retries"] += 1
+                # full jitter: 0 ~ min(최대, 기준 * 2^시도) 사이에서 무작위로 대기
+                await asyncio.sleep(random.uniform(0, min(policy["backoff_max"], policy["backoff"] * 2 ** attempt)))
+                continue
+            break
+        except BaseException:
+            # 잘못된 요청, 취소 등 재시도해도 소용없는 오류는 제공자 장애로 세지 않고 그대로 전달
+            breaker.probing = False
+            raise
+        else:
+            breaker.record_success()
+            return result
+
+    if fallback is not None:
+        return await _use_fallback(provider, fallback, error)
+    raise error
+
+def resilience_stats():
+    return {
+        provider: {**resilience_counters[provider], "state": breaker.state, "consecutive_failures": breaker.failures}
+        for provider, breaker in _breakers.items()
+    }
@@ -0,0 +1,72 @@
+import numpy as np
+
+# 하루 일정의 방문 순서 최적화
+# 하버사인 거리 행렬을 만들고 최근접 이웃으로 초기 경로를 잡은 뒤 2-opt로 개선한다 (시작 지점 고정, 열린 경로)
+
+EARTH_RADIUS_KM = 6371.0
+MAX_TWO_OPT_PASSES = 50
+
+def haversine_matrix(latitudes, longitudes):
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def route_distance(distances, order):
+    order = np.asarray(order)
+    if len(order) < 2:
+        return 0.0
+    return float(distances[order[:-1], order[1:]].sum())
+
+def nearest_neighbor_route(distances, start=0):
+    n = distances.shape[0]
+    visited = np.zeros(n, dtype=bool)
+    order = [start]
+    visited[start] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, distances[order[-1]])
+        nearest = int(np.argmin(row))
+        order.append(nearest)
+        visited[nearest] = True
+    return order
+
+def two_opt(distances, order):
+    # 구간 [i, j]를 뒤집었을 때 줄어드는 거리를 j에 대해 한 번에 계산해서 가장 좋은 개선을 반영
+    route = np.array(order)
+    n = len(route)
+    if n < 4:
+        return route.tolist()
+    for _ in range(MAX_TWO_OPT_PASSES):
+        improved = False
+        for i in range(1, n - 1):
+            j = np.arange(i + 1, n)
+            prev_node = route[i - 1]
+            first = route[i]
+            last = route[j]
+            removed = distances[prev_node, first] + np.where(j + 1 < n, distances[last, route[np.minimum(j + 1, n - 1)]], 0.0)
+            added = distances[prev_node, last] + np.where(j + 1 < n, distances[first, route[np.minimum(j + 1, n - 1)]], 0.0)
+            delta = added - removed
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                k = j[best]
+                route[i:k + 1] = route[i:k + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return route.tolist()
+
+def optimize_route(latitudes, longitudes, start=0):
+    # (방문 순서, 기존 순서 거리 km, 최적화 후 거리 km)
+    n = len(latitudes)
+    if n == 0:
+        return [], 0.0, 0.0
+    distances = haversine_matrix(latitudes, longitudes)
+    original = list(range(n))
+    order = two_opt(distances, nearest_neighbor_route(distances, start))
+    before = route_distance(distances, original)
+    after = route_distance(distances, order)
+    if after > before:
+        order, after = original, before
+    return order, before, after
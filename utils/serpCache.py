@@ -0,0 +1,136 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from serpapi import GoogleSearch
+from database import db, SERP_API_KEY, get_setting
+from utils.resilience import call_with_resilience
+from utils.tracing import trace_span
+
+# SerpAPI 응답 캐시
+# (정규화된 검색어, 언어, 엔진, 격자로 반올림한 위경도)를 키로
+# 프로세스 내 hot 캐시 -> SerpCache 컬렉션(TTL 인덱스) -> SerpAPI 순서로 조회한다
+
+SERP_CACHE_TTL_SECONDS = get_setting("SERP_CACHE_TTL_SECONDS", 60 * 60 * 24)
+SERP_CACHE_GRID_DEGREES = get_setting("SERP_CACHE_GRID_DEGREES", 0.01)
+SERP_HOT_CACHE_SIZE = get_setting("SERP_HOT_CACHE_SIZE", 2000)
+SERP_HOT_CACHE_TTL_SECONDS = get_setting("SERP_HOT_CACHE_TTL_SECONDS", 60 * 10)
+
+SerpCache_collection = db['SerpCache']
+
+_hot_cache = OrderedDict()
+_indexes_ready = False
+
+serp_cache_counters = {
+    "hot_hits": 0,
+    "mongo_hits": 0,
+    "misses": 0,
+    "errors": 0
+}
+
+def _ensure_indexes():
+    global _indexes_ready
+    if not _indexes_ready:
+        SerpCache_collection.create_index("createdAt", expireAfterSeconds=SERP_CACHE_TTL_SECONDS)
+        _indexes_ready = True
+
+def normalize_query(query):
+    return " ".join((query or "").lower().split())
+
+def quantize(value):
+    if value is None:
+        return None
+    return round(round(float(value) / SERP_CACHE_GRID_DEGREES) * SERP_CACHE_GRID_DEGREES, 6)
+
+def _cache_key(query, engine, hl, latitude, longitude):
+    raw = json.dumps([normalize_query(query), engine, hl, latitude, longitude])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def _hot_get(key):
+    entry = _hot_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, data = entry
+    if expires_at < time.monotonic():
+        del _hot_cache[key]
+        return None
+    _hot_cache.move_to_end(key)
+    return data
+
+def _hot_set(key, data):
+    _hot_cache[key] = (time.monotonic() + SERP_HOT_CACHE_TTL_SECONDS, data)
+    _hot_cache.move_to_end(key)
+    while len(_hot_cache) > SERP_HOT_CACHE_SIZE:
+        _hot_cache.popitem(last=False)
+
+async def serp_search(query, latitude=None, longitude=None, engine="google_maps", hl="en"):
+    with trace_span("serpapi", engine) as span:
+        return await _serp_search(query, latitude, longitude, engine, hl, span)
+
+async def _serp_search(query, latitude, longitude, engine, hl, span):
+    latitude = quantize(latitude)
+    longitude = quantize(longitude)
+    key = _cache_key(query, engine, hl, latitude, longitude)
+
+    data = _hot_get(key)
+    if data is not None:
+        serp_cache_counters["hot_hits"] += 1
+        span.set_cache("hit")
+        return data
+
+    try:
+        _ensure_indexes()
+        doc = SerpCache_collection.find_one({"_id": key}, {"data": 1})
+    except Exception as e:
+        print(f"Failed to read serp cache: {e}")
+        doc = None
+    if doc is not None:
+        serp_cache_counters["mongo_hits"] += 1
+        span.set_cache("hit")
+        _hot_set(key, doc["data"])
+        return doc["data"]
+
+    serp_cache_counters["misses"] += 1
+    span.set_cache("miss")
+    params = {
+        "engine": engine,
+        "q": query,
+        "hl": hl,
+        "api_key": SERP_API_KEY
+    }
+    if latitude is not None and longitude is not None:
+        params["ll"] = f"@{latitude},{longitude},14z"
+    data = await call_with_resilience(
+        "serpapi",
+        lambda: asyncio.to_thread(lambda: GoogleSearch(params).get_dict()),
+        admission="serpapi"
+    )
+
+    # 에러 응답은 캐시하지 않음
+    if "error" in data:
+        serp_cache_counters["errors"] += 1
+        return data
+
+    _hot_set(key, data)
+    try:
+        SerpCache_collection.replace_one(
+            {"_id": key},
+            {"_id": key, "query": normalize_query(query), "engine": engine, "hl": hl,
+             "latitude": latitude, "longitude": longitude, "data": data,
+             "createdAt": datetime.datetime.utcnow()},
+            upsert=True
+        )
+    except Exception as e:
+        print(f"Failed to write serp cache: {e}")
+    return data
+
+def serp_cache_stats():
+    lookups = serp_cache_counters["hot_hits"] + serp_cache_counters["mongo_hits"] + serp_cache_counters["misses"]
+    hits = serp_cache_counters["hot_hits"] + serp_cache_counters["mongo_hits"]
+    return {
+        **serp_cache_counters,
+        "hot_size": len(_hot_cache),
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+    }
@@ -0,0 +1,51 @@
+import asyncio
+import functools
+
+# 같은 인자로 동시에 들어온 외부 호출을 하나로 합치는 single-flight
+# 먼저 들어온 호출만 실제로 실행하고, 실행 중에 들어온 같은 키의 호출은 그 결과(또는 예외)를 함께 받는다
+# 끝난 뒤에는 키를 비우므로 결과를 저장하지는 않는다 (캐시는 각 모듈이 따로 둔다)
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self.inflight = {}
+        self.counters = {"calls": 0, "executed": 0, "collapsed": 0, "errors": 0}
+
+    async def do(self, key, fn, *args, **kwargs):
+        self.counters["calls"] += 1
+        task = self.inflight.get(key)
+        if task is not None:
+            self.counters["collapsed"] += 1
+        else:
+            self.counters["executed"] += 1
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self.inflight[key] = task
+            task.add_done_callback(functools.partial(self._finish, key))
+        # 기다리던 요청 하나가 취소돼도 다른 요청이 받을 작업은 계속 진행
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.counters["errors"] += 1
+
+    def stats(self):
+        return {**self.counters, "inflight": len(self.inflight)}
+
+_groups = {}
+
+def single_flight(name, key):
+    # key(*args, **kwargs) -> 해시 가능한 값, 같은 값이면 같은 호출로 본다
+    group = _groups.setdefault(name, SingleFlight(name))
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await group.do(key(*args, **kwargs), fn, *args, **kwargs)
+        wrapper.single_flight = group
+        return wrapper
+    return decorator
+
+def single_flight_stats():
+    return {name: group.stats() for name, group in _groups.items()}
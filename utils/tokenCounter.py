@@ -0,0 +1,19 @@
+# 프롬프트 토큰 수 추정
+# tiktoken 없이 빠르게 계산하기 위한 근사치: 영문/숫자는 약 4글자당 1토큰, 한글 등 비ASCII 문자는 글자당 1토큰
+
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    ascii_count = 0
+    other_count = 0
+    for ch in text:
+        if ord(ch) < 128:
+            ascii_count += 1
+        else:
+            other_count += 1
+    return other_count + (ascii_count + 3) // 4
+
+def estimate_message_tokens(messages):
+    return sum(estimate_tokens(msg.get("content") or "") + MESSAGE_OVERHEAD_TOKENS for msg in messages)
@@ -0,0 +1,225 @@
+import contextvars
+import time
+from collections import deque
+from pymongo import monitoring
+from sqlalchemy import event
+from utils.tokenCounter import estimate_tokens
+
+# 외부 호출(LLM, SerpAPI, 번역, 날씨, 카카오, Mongo, MySQL) 추적
+# 호출마다 span을 남겨 지연 시간, 토큰, 예상 비용, 캐시 적중 여부, 호출한 기능(function_name)을 기록하고
+# 프로세스 내 레지스트리에 누적한다 (/metrics), 요청별 합계는 Server-Timing 헤더로 내려준다
+# database 모듈이 이 모듈을 사용하므로 여기서는 database를 import하지 않는다
+
+# 모델별 예상 단가 (USD / 1M 토큰: 입력, 출력)
+TOKEN_PRICING = {
+    "gpt-4o": (5.0, 15.0),
+    "text-embedding-ada-002": (0.1, 0.0),
+    "gemini-1.5-flash": (0.075, 0.3)
+}
+# 토큰 단위가 아닌 호출당 예상 단가 (USD)
+CALL_PRICING = {
+    "openai_image": 0.02,
+    "serpapi": 0.015
+}
+
+SPAN_SAMPLES = 1000
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+_function_name = contextvars.ContextVar("function_name", default=None)
+
+def set_function_name(name):
+    # 이후 같은 요청(작업) 안에서 남기는 span은 이 이름으로 묶인다
+    _function_name.set(name)
+
+def start_request_trace(function_name=None):
+    spans = []
+    _request_spans.set(spans)
+    _function_name.set(function_name)
+    return spans
+
+def estimate_cost(provider, model, prompt_tokens, completion_tokens):
+    if model in TOKEN_PRICING:
+        input_price, output_price = TOKEN_PRICING[model]
+        return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+    return CALL_PRICING.get(provider, 0.0)
+
+class Span:
+    def __init__(self, provider, operation, model=None):
+        self.provider = provider
+        self.operation = operation
+        self.model = model
+        self.function_name = _function_name.get()
+        self.cache = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.error = None
+        self.duration_ms = 0.0
+        self.started = None
+
+    def set_usage(self, prompt_tokens=0, completion_tokens=0):
+        self.prompt_tokens = prompt_tokens or 0
+        self.completion_tokens = completion_tokens or 0
+
+    def set_cache(self, status):
+        # "hit" / "miss" / "stale" / "partial"
+        self.cache = status
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 스트리밍을 소비하는 쪽이 중간에 멈춘 경우(GeneratorExit)는 오류로 보지 않음
+        error = exc_type.__name__ if exc_type and exc_type is not GeneratorExit else None
+        self.finish(time.perf_counter() - self.started, error)
+        return False
+
+    def finish(self, seconds, error=None):
+        self.duration_ms = seconds * 1000
+        self.error = error
+        # 캐시에서 바로 응답한 경우는 외부 호출 비용이 없음
+        if self.cache != "hit":
+            self.cost = estimate_cost(self.provider, self.model, self.prompt_tokens, self.completion_tokens)
+        metrics_registry.record(self)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append(self)
+
+def trace_span(provider, operation, model=None):
+    return Span(provider, operation, model)
+
+def openai_usage(span, response):
+    usage = response.get("usage") if hasattr(response, "get") else None
+    if usage:
+        span.set_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+
+def gemini_usage(span, response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        span.set_usage(getattr(usage, "prompt_token_count", 0), getattr(usage, "candidates_token_count", 0))
+
+def estimate_usage(span, prompt_text, completion_text):
+    # 스트리밍처럼 사용량을 받지 못하는 호출은 추정치 사용
+    span.set_usage(estimate_tokens(prompt_text), estimate_tokens(completion_text))
+
+def _new_stats():
+    return {
+        "calls": 0, "errors": 0, "latency_ms_sum": 0.0,
+        "latency_buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        "samples": deque(maxlen=SPAN_SAMPLES),
+        "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+        "cache_hits": 0, "cache_misses": 0
+    }
+
+def _percentile(values, ratio):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * ratio), len(ordered) - 1)]
+
+def _snapshot(stats):
+    histogram = {}
+    total = 0
+    for bound, count in zip(LATENCY_BUCKETS_MS + ["inf"], stats["latency_buckets"]):
+        total += count
+        histogram[f"le_{bound}"] = total
+    return {
+        "calls": stats["calls"],
+        "errors": stats["errors"],
+        "latency_ms_avg": round(stats["latency_ms_sum"] / stats["calls"], 2) if stats["calls"] else 0.0,
+        "latency_ms_p50": round(_percentile(stats["samples"], 0.5), 2),
+        "latency_ms_p95": round(_percentile(stats["samples"], 0.95), 2),
+        "latency_ms_histogram": histogram,
+        "prompt_tokens": stats["prompt_tokens"],
+        "completion_tokens": stats["completion_tokens"],
+        "cost_usd": round(stats["cost_usd"], 6),
+        "cache_hits": stats["cache_hits"],
+        "cache_misses": stats["cache_misses"]
+    }
+
+class MetricsRegistry:
+    def __init__(self):
+        self.operations = {}
+        self.functions = {}
+
+    def _add(self, stats, span):
+        stats["calls"] += 1
+        if span.error:
+            stats["errors"] += 1
+        stats["latency_ms_sum"] += span.duration_ms
+        index = 0
+        while index < len(LATENCY_BUCKETS_MS) and span.duration_ms > LATENCY_BUCKETS_MS[index]:
+            index += 1
+        stats["latency_buckets"][index] += 1
+        stats["samples"].append(span.duration_ms)
+        stats["prompt_tokens"] += span.prompt_tokens
+        stats["completion_tokens"] += span.completion_tokens
+        stats["cost_usd"] += span.cost
+        if span.cache == "hit":
+            stats["cache_hits"] += 1
+        elif span.cache is not None:
+            stats["cache_misses"] += 1
+
+    def record(self, span):
+        self._add(self.operations.setdefault(f"{span.provider}.{span.operation}", _new_stats()), span)
+        self._add(self.functions.setdefault(f"{span.function_name or 'unknown'}:{span.provider}", _new_stats()), span)
+
+    def snapshot(self):
+        return {
+            "operations": {key: _snapshot(stats) for key, stats in self.operations.items()},
+            "functions": {key: _snapshot(stats) for key, stats in self.functions.items()}
+        }
+
+metrics_registry = MetricsRegistry()
+
+def server_timing_header(spans):
+    # 제공자별 호출 수/시간/비용 합계 (예: openai;dur=812.4;desc="n=1 tokens=950 cost=$0.0061")
+    totals = {}
+    for span in list(spans):
+        total = totals.setdefault(span.provider, {"n": 0, "dur": 0.0, "tokens": 0, "cost": 0.0, "hits": 0})
+        total["n"] += 1
+        total["dur"] += span.duration_ms
+        total["tokens"] += span.prompt_tokens + span.completion_tokens
+        total["cost"] += span.cost
+        total["hits"] += 1 if span.cache == "hit" else 0
+    entries = []
+    for provider, total in totals.items():
+        desc = f"n={total['n']}"
+        if total["tokens"]:
+            desc += f" tokens={total['tokens']}"
+        if total["cost"]:
+            desc += f" cost=${total['cost']:.4f}"
+        if total["hits"]:
+            desc += f" cache_hits={total['hits']}"
+        entries.append(f'{provider};dur={total["dur"]:.1f};desc="{desc}"')
+    return ", ".join(entries)
+
+class MongoTraceListener(monitoring.CommandListener):
+    # pymongo 명령 단위로 span 기록 (모든 컬렉션 접근이 대상)
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        Span("mongo", event.command_name).finish(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        Span("mongo", event.command_name).finish(event.duration_micros / 1_000_000, event.failure.get("codeName", "error") if isinstance(event.failure, dict) else "error")
+
+def instrument_engine(engine):
+    # SQLAlchemy 쿼리 실행 단위로 span 기록
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("trace_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["trace_started"].pop()
+        Span("mysql", statement.split(None, 1)[0].lower() if statement else "query").finish(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started_list = context.connection.info.get("trace_started") if context.connection is not None else None
+        if started_list:
+            Span("mysql", "error").finish(time.perf_counter() - started_list.pop(), type(context.original_exception).__name__)
@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from deep_translator import GoogleTranslator
+from database import db, get_setting
+from utils.resilience import call_with_resilience
+from utils.tracing import trace_span
+
+# 번역 공용 서비스
+# (source, target, text) 키로 프로세스 내 LRU와 TranslationCache 컬렉션에 결과를 저장하고,
+# 캐시 미스만 동시에 번역 요청한다
+
+TRANSLATION_LRU_SIZE = get_setting("TRANSLATION_LRU_SIZE", 10000)
+TRANSLATION_CONCURRENCY = get_setting("TRANSLATION_CONCURRENCY", 8)
+
+TranslationCache_collection = db['TranslationCache']
+
+_lru = OrderedDict()
+_semaphore = None
+
+def _cache_key(source, target, text):
+    return hashlib.sha1(f"{source}:{target}:{text}".encode('utf-8')).hexdigest()
+
+def _lru_get(key):
+    value = _lru.get(key)
+    if value is not None:
+        _lru.move_to_end(key)
+    return value
+
+def _lru_set(key, value):
+    _lru[key] = value
+    _lru.move_to_end(key)
+    while len(_lru) > TRANSLATION_LRU_SIZE:
+        _lru.popitem(last=False)
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(TRANSLATION_CONCURRENCY)
+    return _semaphore
+
+async def _fetch(text, source, target):
+    async with _get_semaphore():
+        try:
+            return await call_with_resilience(
+                "translator",
+                lambda: asyncio.to_thread(GoogleTranslator(source=source, target=target).translate, text)
+            )
+        except Exception as e:
+            # 번역 실패 시 원문을 그대로 사용 (캐시에는 저장하지 않음)
+            print(f"Translation failed: {e}")
+            return None
+
+async def translate_batch(texts, source='en', target='ko'):
+    # 입력 순서대로 번역 결과 리스트 반환, 같은 문장은 한 번만 번역
+    with trace_span("translator", "translate_batch") as span:
+        return await _translate_batch(texts, source, target, span)
+
+async def _translate_batch(texts, source, target, span):
+    results = [None] * len(texts)
+    pending = {}
+    for i, text in enumerate(texts):
+        if not text or not text.strip():
+            results[i] = text
+            continue
+        key = _cache_key(source, target, text)
+        cached = _lru_get(key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(key, (text, []))[1].append(i)
+
+    if pending:
+        try:
+            for doc in TranslationCache_collection.find({"_id": {"$in": list(pending.keys())}}, {"translation": 1}):
+                text, indexes = pending.pop(doc["_id"])
+                _lru_set(doc["_id"], doc["translation"])
+                for i in indexes:
+                    results[i] = doc["translation"]
+        except Exception as e:
+            print(f"Failed to read translation cache: {e}")
+
+    # 전부 캐시에서 찾았으면 hit, 일부만 찾았으면 partial
+    if not pending:
+        span.set_cache("hit")
+    else:
+        span.set_cache("partial" if len(pending) < len(texts) else "miss")
+
+    if pending:
+        keys = list(pending.keys())
+        translations = await asyncio.gather(*[_fetch(pending[key][0], source, target) for key in keys])
+        new_docs = []
+        for key, translation in zip(keys, translations):
+            text, indexes = pending[key]
+            if translation is None:
+                translation = text
+            else:
+                _lru_set(key, translation)
+                new_docs.append({"_id": key, "source": source, "target": target, "text": text, "translation": translation})
+            for i in indexes:
+                results[i] = translation
+        if new_docs:
+            try:
+                TranslationCache_collection.insert_many(new_docs, ordered=False)
+            except Exception as e:
+                # 동시에 같은 문장을 저장한 경우의 중복 키 오류는 무시
+                print(f"Failed to write translation cache: {e}")
+
+    return results
+
+async def translate(text, source='en', target='ko'):
+    return (await translate_batch([text], source, target))[0]